@@ -1,6 +1,9 @@
 // backend/api/clustering/index.js
 
-import { getBusinessesByCategory } from "../../services/clusteringService.js";
+import {
+  getBusinessesByCategory,
+  getClusterSummaries,
+} from "../../services/clusteringService.js";
 
 export default async function handler(req, res) {
   if (req.method !== "GET") {
@@ -18,10 +21,14 @@ export default async function handler(req, res) {
       });
     }
 
-    // Fetch raw businesses only
+    // Fetch raw businesses plus one summary per cluster they belong to
     const businesses = await getBusinessesByCategory(category);
+    const clusterIds = [
+      ...new Set(businesses.map((b) => b.cluster).filter((c) => c != null)),
+    ];
+    const clusters = clusterIds.length ? await getClusterSummaries(clusterIds) : [];
 
-    return res.status(200).json({ businesses });
+    return res.status(200).json({ businesses, clusters });
   } catch (err) {
     console.error("Clustering API error:", err);
 
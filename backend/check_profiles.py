@@ -1,13 +1,13 @@
 import os
-from supabase import create_client, Client
+import sys
 from dotenv import load_dotenv
 
-load_dotenv(override=True)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "ml"))
+from storage import get_client
 
-url = os.getenv("SUPABASE_URL")
-key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+load_dotenv(override=True)
 
-supabase: Client = create_client(url, key)
+supabase = get_client()
 
 print("Checking profiles table...")
 try:
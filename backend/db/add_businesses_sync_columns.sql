@@ -0,0 +1,34 @@
+-- =============================================================================
+-- Prepare the enhanced businesses table for diff-based ML writes
+-- Required by backend/ml/writer.py (upsert on business_id + content hash)
+-- =============================================================================
+
+-- 1. ML output columns written by train_model
+ALTER TABLE public.businesses
+ADD COLUMN IF NOT EXISTS cluster INTEGER,
+ADD COLUMN IF NOT EXISTS distance_to_center DOUBLE PRECISION,
+ADD COLUMN IF NOT EXISTS business_density INTEGER,
+ADD COLUMN IF NOT EXISTS competitor_density INTEGER,
+ADD COLUMN IF NOT EXISTS category_distribution JSONB,
+ADD COLUMN IF NOT EXISTS cluster_center JSONB;
+
+-- 2. Content hash of the last written row (used to skip unchanged rows)
+ALTER TABLE public.businesses
+ADD COLUMN IF NOT EXISTS content_hash TEXT;
+
+-- 3. Remove duplicate business_id rows left over from full reloads
+DELETE FROM public.businesses a
+USING public.businesses b
+WHERE a.business_id = b.business_id
+  AND a.id < b.id;
+
+-- 4. business_id must be unique for ON CONFLICT (business_id) upserts
+DO $$
+BEGIN
+  IF NOT EXISTS (
+    SELECT 1 FROM pg_constraint WHERE conname = 'businesses_business_id_key'
+  ) THEN
+    ALTER TABLE public.businesses
+    ADD CONSTRAINT businesses_business_id_key UNIQUE (business_id);
+  END IF;
+END $$;
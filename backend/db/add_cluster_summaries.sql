@@ -0,0 +1,36 @@
+-- =============================================================================
+-- Per-cluster aggregates written by backend/ml (features.summarize_clusters)
+-- Business rows keep only the cluster id; center and category mix live here
+-- once per cluster instead of as JSON on every member row.
+-- =============================================================================
+
+-- 1. One row per cluster
+CREATE TABLE IF NOT EXISTS public.cluster_summaries (
+    cluster INTEGER PRIMARY KEY,
+    center_latitude DOUBLE PRECISION NOT NULL,
+    center_longitude DOUBLE PRECISION NOT NULL,
+    population INTEGER NOT NULL,
+    category_distribution JSONB NOT NULL DEFAULT '{}'::jsonb,
+    competitor_counts JSONB NOT NULL DEFAULT '{}'::jsonb
+);
+
+-- 2. Readable like businesses; only the service role (ML service) writes
+ALTER TABLE public.cluster_summaries ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Service Role Full Access" ON public.cluster_summaries;
+CREATE POLICY "Service Role Full Access" ON public.cluster_summaries
+    FOR ALL
+    USING (auth.role() = 'service_role')
+    WITH CHECK (auth.role() = 'service_role');
+
+DROP POLICY IF EXISTS "Public Read Access" ON public.cluster_summaries;
+CREATE POLICY "Public Read Access" ON public.cluster_summaries
+    FOR SELECT
+    USING (true);
+
+-- 3. Per-row JSON blobs are no longer written by train_model
+ALTER TABLE public.businesses
+DROP COLUMN IF EXISTS category_distribution,
+DROP COLUMN IF EXISTS cluster_center;
+
+CREATE INDEX IF NOT EXISTS businesses_cluster_idx ON public.businesses (cluster);
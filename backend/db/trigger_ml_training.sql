@@ -31,3 +31,6 @@ ALTER PUBLICATION supabase_realtime ADD TABLE businesses;
 -- 3. Events: INSERT, UPDATE, DELETE
 -- 4. HTTP Request: POST to http://localhost:8000/train
 -- 5. This will automatically trigger ML training on any change
+-- 6. /train returns 202 with a job id; a burst of row events (e.g. a CSV upload)
+--    is coalesced into one run (ML_TRAIN_DEBOUNCE_SECONDS, default 5s).
+--    Poll GET /train/{job_id} or GET /train/latest for the result.
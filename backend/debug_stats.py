@@ -1,28 +1,26 @@
 import os
-from supabase import create_client, Client
+import sys
 from dotenv import load_dotenv
-from collections import Counter
 
-load_dotenv(override=True)
+# Shared paginated reader lives with the ML service
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "ml"))
+from source import read_table
+from storage import get_client
 
-url = os.getenv("SUPABASE_URL")
-key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+load_dotenv(override=True)
 
-print(f"Connecting to: {url}")
-supabase: Client = create_client(url, key)
+backend = os.getenv("STORAGE_BACKEND", "supabase")
+print(f"Connecting to: {os.getenv('SUPABASE_URL') if backend == 'supabase' else backend}")
+supabase = get_client()
 
 try:
     print("Fetching categories and zones...")
-    response = supabase.table("business_raw").select("general_category, zone_type").execute()
-    
-    data = response.data
-    print(f"Total rows fetched: {len(data)}")
+    df = read_table(supabase, "business_raw", ["general_category", "zone_type"])
     
-    categories = [row['general_category'] for row in data]
-    zones = [row['zone_type'] for row in data]
+    print(f"Total rows fetched: {len(df)}")
     
-    unique_categories = set(categories)
-    unique_zones = set(zones)
+    unique_categories = set(df["general_category"])
+    unique_zones = set(df["zone_type"])
     
     print(f"\nUnique Categories Count: {len(unique_categories)}")
     print("Categories:", unique_categories)
@@ -2,148 +2,502 @@
 """
 Import CSV data to Supabase businesses table.
 
-This script reads rawbusinessdata.csv and imports all businesses into Supabase.
-It handles category normalization and clears existing data before import.
+This script streams rawbusinessdata.csv into Supabase. Rows are parsed,
+normalized, checked for near-duplicates and batched lazily, batches are
+upserted (keyed by business_id) by a bounded pool of concurrent workers with
+retry/backoff, and progress is checkpointed so a crashed import resumes where
+it stopped.
+
+Upserts need a unique business_id (see db/add_businesses_sync_columns.sql).
+
+Usage:
+    python import_csv_to_supabase.py [csv_file] [--table businesses]
+                                     [--workers 4] [--replace] [--restart]
+                                     [--duplicate-radius 30]
 """
 
+import argparse
 import csv
+import json
+import math
 import os
-from supabase import create_client, Client
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from functools import lru_cache
 from dotenv import load_dotenv
 
+# Shared paginated reader and storage backends live with the ML service
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "ml"))
+from source import read_table
+from storage import get_client
+
 # Load environment variables
 load_dotenv(override=True)
 
-# Supabase configuration
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-
-if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
-    print("Error: SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set in .env")
+# Supabase client (service role key bypasses RLS), or a local SQLite file
+# when STORAGE_BACKEND=local
+try:
+    supabase = get_client()
+except RuntimeError as e:
+    print(f"Error: {e}")
     exit(1)
 
-# Initialize Supabase client (using service role key to bypass RLS)
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+DEFAULT_TABLE = "businesses"
+DEFAULT_CHECKPOINT = "import_checkpoint.json"
+
+# Adaptive batch size bounds (rows per request)
+MIN_BATCH_SIZE = 50
+START_BATCH_SIZE = 500
+MAX_BATCH_SIZE = 2000
+# Grow batches while requests finish faster than this, shrink above it
+TARGET_BATCH_SECONDS = 2.0
+
+MAX_RETRIES = 5
+BACKOFF_SECONDS = 0.5
+
+# Same normalized name within this many meters counts as a duplicate
+DUPLICATE_RADIUS_M = 30.0
+METERS_PER_DEGREE = 111_320.0
+
+
+# =============================================================================
+# Normalization tables: canonical value -> spellings seen in municipal lists.
+# Spellings are compared by key (lowercase words, "&" read as "and")
+# =============================================================================
+
+CATEGORY_ALIASES = {
+    "Retail": ("retail", "retail store", "retailer"),
+    "Services": ("services", "service"),
+    "Restaurant": ("restaurant", "restaurants", "resto"),
+    "Food & Beverages": ("food & beverage", "f&b", "fnb"),
+    "Merchandise / Trading": (
+        "merchandise / trading", "merchandising / trading", "merchandise",
+        "merchandising", "trading",
+    ),
+    "Entertainment / Leisure": (
+        "entertainment / leisure", "entertainment", "leisure",
+    ),
+    "Pet Store": ("pet store", "pet shop", "pet supplies"),
+}
+
+# Fallback for longer labels: every word must start one of the label's words
+# ("General Merchandising", "Food and Beverage Kiosk")
+CATEGORY_KEYWORDS = {
+    "Merchandise / Trading": (("merchandis",),),
+    "Food & Beverages": (("food", "beverage"),),
+}
+
+ZONE_ALIASES = {
+    "Commercial": ("commercial", "comm", "com"),
+    "Residential": ("residential", "res", "resi"),
+    "Industrial": ("industrial", "ind"),
+    "Institutional": ("institutional", "inst"),
+    "Agricultural": ("agricultural", "agri"),
+    "Mixed Use": ("mixed use", "mixed"),
+}
+
+STATUS_ALIASES = {
+    "active": ("active", "open", "operating", "operational"),
+    "inactive": ("inactive", "closed", "ceased", "retired", "not operating"),
+}
+
+
+def normalize_key(value: str) -> str:
+    """Lowercase words of a label or name, punctuation dropped."""
+    value = value.lower().replace("&", " and ").replace("'", "")
+    return " ".join(word for word in re.split(r"[^0-9a-z]+", value) if word and word != "and")
+
+
+class NormalizationMap:
+    """
+    Maps free-text labels to canonical values through an alias table, with
+    optional keyword rules for labels the table does not list. Lookups are
+    cached per raw value, so each distinct spelling is resolved once per
+    import. Unknown values pass through `fallback` (stripped by default).
+    """
+
+    def __init__(self, aliases, keywords=None, fallback=str.strip):
+        self._index = {}
+        for canonical, spellings in aliases.items():
+            for spelling in (canonical, *spellings):
+                self._index[normalize_key(spelling)] = canonical
+        self._keywords = [
+            (words, canonical)
+            for canonical, rules in (keywords or {}).items()
+            for words in rules
+        ]
+        self._fallback = fallback
+        self.lookup = lru_cache(maxsize=None)(self._lookup)
+
+    def __call__(self, value) -> str:
+        return self.lookup(value or "")
+
+    def _lookup(self, value: str) -> str:
+        key = normalize_key(value)
+        if key in self._index:
+            return self._index[key]
+        words = key.split()
+        for keywords, canonical in self._keywords:
+            if all(any(word.startswith(k) for word in words) for k in keywords):
+                return canonical
+        return self._fallback(value)
+
+
+CATEGORY_MAP = NormalizationMap(CATEGORY_ALIASES, CATEGORY_KEYWORDS)
+ZONE_MAP = NormalizationMap(ZONE_ALIASES)
+STATUS_MAP = NormalizationMap(STATUS_ALIASES, fallback=lambda value: value.strip().lower())
 
-def clear_existing_data():
-    """Clear all existing data from businesses table."""
-    print("Clearing existing data from businesses table...")
-    try:
-        result = supabase.table("businesses").delete().neq("id", 0).execute()
-        print("Existing data cleared successfully")
-    except Exception as e:
-        print(f"Warning: Could not clear existing data: {e}")
-        print("   (Table might be empty, continuing...)")
 
 def normalize_category(category: str) -> str:
     """
     Normalize category names to handle spelling variations.
     """
-    category = category.strip()
-    
-    # Handle "Merchandising / Trading" -> "Merchandise / Trading"
-    if "merchandising" in category.lower():
-        return "Merchandise / Trading"
-    
-    # Handle "Food and Beverages" -> "Food & Beverages"
-    if "food" in category.lower() and "beverage" in category.lower():
-        return "Food & Beverages"
-    
-    return category
-
-def import_csv_data(csv_file: str):
-    """Import businesses from CSV file to Supabase."""
-    print(f"Reading CSV file: {csv_file}")
-    
-    businesses = []
-    with open(csv_file, 'r', encoding='utf-8') as f:
+    return CATEGORY_MAP(category)
+
+
+class DuplicateIndex:
+    """
+    Spatial hash of the businesses kept so far, for near-duplicate checks.
+
+    Positions are projected to meters around the first row's latitude and
+    bucketed into cells one radius wide, so a match can only sit in the
+    row's own cell or one of its 8 neighbours. Each cell maps normalized
+    name keys to the businesses there: a check is a few dict lookups, and a
+    whole import stays linear in the number of rows. A repeated business_id
+    is always a duplicate.
+    """
+
+    def __init__(self, radius_m: float = DUPLICATE_RADIUS_M):
+        self.radius_m = radius_m
+        self._cells = {}
+        self._ids = set()
+        self._lon_scale = None
+        self.duplicates = []
+
+    def add(self, business) -> bool:
+        """Index the business; False (and recorded) when it is a duplicate."""
+        business_id = business['business_id']
+        if business_id in self._ids:
+            self.duplicates.append((business_id, business_id))
+            return False
+        if self.radius_m > 0:
+            x, y = self._project(business['latitude'], business['longitude'])
+            name = normalize_key(business['business_name'])
+            cell_x, cell_y = int(x // self.radius_m), int(y // self.radius_m)
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    for kept_id, kx, ky in self._cells.get((cell_x + dx, cell_y + dy), {}).get(name, ()):
+                        if math.hypot(x - kx, y - ky) <= self.radius_m:
+                            self.duplicates.append((business_id, kept_id))
+                            return False
+            cell = self._cells.setdefault((cell_x, cell_y), {})
+            cell.setdefault(name, []).append((business_id, x, y))
+        self._ids.add(business_id)
+        return True
+
+    def _project(self, latitude: float, longitude: float):
+        if self._lon_scale is None:
+            self._lon_scale = METERS_PER_DEGREE * math.cos(math.radians(latitude))
+        return longitude * self._lon_scale, latitude * METERS_PER_DEGREE
+
+
+# =============================================================================
+# Pipeline stages (generators; only the duplicate index grows with the rows)
+# =============================================================================
+
+def read_rows(csv_file: str):
+    """Yield (row_number, raw CSV row)."""
+    with open(csv_file, 'r', encoding='utf-8', newline='') as f:
         reader = csv.DictReader(f)
-        first_row = True
-        for row in reader:
-            if first_row:
-                print("\nDEBUG: First row raw data:")
-                print(row)
-                first_row = False
-
-            # Normalize category
-            category = normalize_category(row['general_category'])
-            
-            # Build business object for 'businesses' table
-            # Note: 'id' is auto-generated, so we don't include it
-            business = {
-                'business_name': row['business_name'].strip(),
-                'general_category': category,
-                'latitude': float(row['latitude']),
-                'longitude': float(row['longitude']),
-                'street': row['street'].strip(),
-                'zone_type': row['zone_type'].strip(),
-                'status': row['status'].strip().lower(),  # normalize to lowercase
-            }
-            
-            if len(businesses) == 0:
-                print("\nDEBUG: First constructed business object:")
-                print(business)
-                
-            businesses.append(business)
-    
-    print(f"Found {len(businesses)} businesses to import")
-    
-    # Display category distribution
-    from collections import Counter
-    categories = [b['general_category'] for b in businesses]
-    category_counts = Counter(categories)
-    print("\nCategory Distribution:")
-    for cat, count in sorted(category_counts.items(), key=lambda x: -x[1]):
-        print(f"   {cat}: {count}")
-    print()
-    
-    # Import in batches (Supabase has limits)
-    BATCH_SIZE = 100
-    total_imported = 0
-    
-    for i in range(0, len(businesses), BATCH_SIZE):
-        batch = businesses[i:i + BATCH_SIZE]
-        print(f"Importing batch {i//BATCH_SIZE + 1} ({len(batch)} businesses)...")
-        
+        for row_number, row in enumerate(reader):
+            yield row_number, row
+
+
+def normalize_rows(rows):
+    """Yield (row_number, business object) for the target table."""
+    for row_number, row in rows:
+        yield row_number, {
+            'business_id': int(row['business_id']),
+            'business_name': row['business_name'].strip(),
+            'general_category': normalize_category(row['general_category']),
+            'latitude': float(row['latitude']),
+            'longitude': float(row['longitude']),
+            'street': row['street'].strip(),
+            'zone_type': ZONE_MAP(row['zone_type']),
+            'status': STATUS_MAP(row['status']),
+        }
+
+
+def drop_duplicates(rows, index: DuplicateIndex):
+    """
+    Yield every row, with None in place of near-duplicates of an earlier row,
+    so batch positions (and the checkpoint) still cover the dropped rows.
+    """
+    for row_number, business in rows:
+        yield row_number, business if index.add(business) else None
+
+
+def clean_rows(csv_file: str, index: DuplicateIndex):
+    """Read, normalize and de-duplicate the CSV."""
+    return drop_duplicates(normalize_rows(read_rows(csv_file)), index)
+
+
+def skip_rows(rows, skip: int):
+    """Drop rows already imported."""
+    for row_number, business in rows:
+        if row_number >= skip:
+            yield row_number, business
+
+
+def batch_rows(rows, sizer):
+    """
+    Yield (first_row, end_row, businesses) using the current adaptive size.
+    The CSV range includes dropped (None) rows; a trailing range of only
+    dropped rows is yielded with no businesses so the checkpoint reaches it.
+    """
+    batch, first, end = [], None, None
+    for row_number, business in rows:
+        if first is None:
+            first = row_number
+        end = row_number + 1
+        if business is not None:
+            batch.append(business)
+        if len(batch) >= sizer.size:
+            yield first, end, batch
+            batch, first = [], None
+    if first is not None:
+        yield first, end, batch
+
+
+class BatchSizer:
+    """Doubles the batch size while requests are fast, halves it on trouble."""
+
+    def __init__(self, size=START_BATCH_SIZE):
+        self.size = size
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, ok: bool):
+        with self._lock:
+            if not ok or seconds > TARGET_BATCH_SECONDS:
+                self.size = max(MIN_BATCH_SIZE, self.size // 2)
+            elif seconds < TARGET_BATCH_SECONDS / 2:
+                self.size = min(MAX_BATCH_SIZE, self.size * 2)
+
+
+class Checkpoint:
+    """
+    Persists the number of leading CSV rows that are fully imported.
+
+    Batches finish out of order, so only the contiguous prefix of completed
+    batches counts; a resumed import may re-send a few rows, which is safe
+    because batches are upserts keyed by business_id.
+    """
+
+    def __init__(self, path: str, csv_file: str, restart: bool = False):
+        self.path = path
+        self.source = {
+            'csv_file': os.path.abspath(csv_file),
+            'size': os.path.getsize(csv_file),
+            'mtime': os.path.getmtime(csv_file),
+        }
+        self.rows_done = 0
+        self._finished = {}
+        self._lock = threading.Lock()
+
+        if not restart and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            # Only resume when it is the same, unchanged file
+            if saved.get('source') == self.source:
+                self.rows_done = saved.get('rows_done', 0)
+
+    def complete(self, first: int, end: int):
+        with self._lock:
+            self._finished[first] = end
+            advanced = False
+            while self.rows_done in self._finished:
+                self.rows_done = self._finished.pop(self.rows_done)
+                advanced = True
+            if advanced:
+                self._save()
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _save(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'source': self.source, 'rows_done': self.rows_done}, f)
+        os.replace(tmp, self.path)
+
+
+def upload_batch(table: str, batch, sizer: BatchSizer):
+    """Upsert one batch, retrying with exponential backoff and jitter."""
+    if not batch:
+        return
+    for attempt in range(MAX_RETRIES):
+        started = time.monotonic()
         try:
-            result = supabase.table("businesses").insert(batch).execute()
-            total_imported += len(batch)
-            print(f"   Batch imported successfully")
-        except Exception as e:
-            print(f"   Error importing batch: {e}")
-            raise
-    
-    print(f"\nImport complete! Total businesses imported: {total_imported}")
-    return total_imported
+            supabase.table(table).upsert(batch, on_conflict='business_id').execute()
+            sizer.record(time.monotonic() - started, ok=True)
+            return
+        except Exception:
+            sizer.record(time.monotonic() - started, ok=False)
+            if attempt == MAX_RETRIES - 1:
+                raise
+            time.sleep(BACKOFF_SECONDS * (2 ** attempt) * (1 + random.random()))
+
+
+def import_csv_data(csv_file: str, table: str = DEFAULT_TABLE, workers: int = 4,
+                    checkpoint_file: str = DEFAULT_CHECKPOINT, restart: bool = False,
+                    duplicate_radius: float = DUPLICATE_RADIUS_M, log=print):
+    """
+    Stream businesses from CSV file to Supabase.
+
+    Returns (rows imported in this run, category counts for those rows).
+    """
+    checkpoint = Checkpoint(checkpoint_file, csv_file, restart=restart)
+    if checkpoint.rows_done:
+        log(f"Resuming from checkpoint: skipping {checkpoint.rows_done} rows")
+
+    sizer = BatchSizer()
+    category_counts = Counter()
+    total_imported = 0
+    batch_number = 0
+
+    def tracked(rows):
+        # Tally while streaming instead of keeping the rows around
+        for row_number, business in rows:
+            if business is not None:
+                category_counts[business['general_category']] += 1
+            yield row_number, business
+
+    # Rows before the checkpoint are still indexed, so a resumed import
+    # drops the same duplicates as an uninterrupted one
+    duplicates = DuplicateIndex(duplicate_radius)
+    batches = batch_rows(
+        tracked(skip_rows(clean_rows(csv_file, duplicates), checkpoint.rows_done)), sizer
+    )
+
+    # Bounded pool: at most 2 batches per worker are in flight at any time
+    in_flight = {}
+    failure = None
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for first, end, batch in batches:
+            batch_number += 1
+            while len(in_flight) >= workers * 2 and failure is None:
+                imported, failure = _collect(in_flight, checkpoint, log)
+                total_imported += imported
+            if failure is not None:
+                break
+            future = pool.submit(upload_batch, table, batch, sizer)
+            in_flight[future] = (batch_number, first, end, len(batch))
+        # Let running batches finish so the checkpoint is as far along as possible
+        while in_flight:
+            imported, error = _collect(in_flight, checkpoint, log)
+            total_imported += imported
+            failure = failure or error
+
+    if failure is not None:
+        log(f"   Progress saved; rerun to resume from row {checkpoint.rows_done}")
+        raise failure
+
+    checkpoint.clear()
+    log_duplicates(duplicates, log)
+    log(f"\nImport complete! Total businesses imported: {total_imported}")
+    return total_imported, category_counts
 
-def verify_import():
+
+def log_duplicates(index: DuplicateIndex, log, limit: int = 20):
+    if not index.duplicates:
+        return
+    log(f"\nSkipped {len(index.duplicates)} duplicate rows "
+        f"(same business_id, or same name within {index.radius_m:g} m):")
+    for business_id, kept_id in index.duplicates[:limit]:
+        log(f"   business_id {business_id} duplicates {kept_id}")
+    if len(index.duplicates) > limit:
+        log(f"   ... and {len(index.duplicates) - limit} more")
+
+
+def csv_business_ids(csv_file: str, duplicate_radius: float = DUPLICATE_RADIUS_M):
+    """Every business_id the import keeps (ids only, streamed)."""
+    index = DuplicateIndex(duplicate_radius)
+    return {
+        business['business_id']
+        for _, business in clean_rows(csv_file, index) if business is not None
+    }
+
+
+def _collect(in_flight, checkpoint: Checkpoint, log):
+    """Wait for at least one batch; returns (rows imported, first error or None)."""
+    done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+    imported, failure = 0, None
+    for future in done:
+        batch_number, first, end, size = in_flight.pop(future)
+        error = future.exception()
+        if error is not None:
+            log(f"   Batch {batch_number} failed after {MAX_RETRIES} attempts: {error}")
+            failure = failure or error
+            continue
+        checkpoint.complete(first, end)
+        imported += size
+        log(f"   Batch {batch_number} imported ({size} businesses)")
+    return imported, failure
+
+
+def remove_stale_rows(table: str, keep_ids, log=print):
+    """Delete rows whose business_id is no longer in the CSV (--replace)."""
+    stored = read_table(supabase, table, ['business_id'])
+    stale = [int(b) for b in stored['business_id'] if b not in keep_ids]
+    for i in range(0, len(stale), 500):
+        supabase.table(table).delete().in_('business_id', stale[i:i + 500]).execute()
+    log(f"Removed {len(stale)} businesses not present in the CSV")
+
+
+def verify_import(table: str = DEFAULT_TABLE, expected: int = None, log=print):
     """Verify the import was successful."""
-    print("\nVerifying import...")
-    
+    log("\nVerifying import...")
+
     try:
-        # Count total businesses
-        result = supabase.table("businesses").select("*", count="exact").execute()
-        total_count = result.count
-        print(f"Total businesses in database: {total_count}")
-        
-        # Get category distribution
-        all_data = supabase.table("businesses").select("general_category").execute()
-        from collections import Counter
-        categories = [row['general_category'] for row in all_data.data]
-        category_counts = Counter(categories)
-        
-        print(f"Unique categories: {len(category_counts)}")
-        print("\nCategory counts in database:")
+        # Category distribution (paginated, category column only)
+        stored = read_table(supabase, table, ['general_category'])
+        total_count = len(stored)
+        log(f"Total businesses in database: {total_count}")
+
+        category_counts = Counter(stored['general_category'])
+        log(f"Unique categories: {len(category_counts)}")
+        log("\nCategory counts in database:")
         for cat, count in sorted(category_counts.items(), key=lambda x: -x[1]):
-            print(f"   {cat}: {count}")
-        
-        return total_count == 100
+            log(f"   {cat}: {count}")
+
+        return expected is None or total_count >= expected
     except Exception as e:
-        print(f"Verification error: {e}")
+        log(f"Verification error: {e}")
         return False
 
+
 def main():
     """Main import process."""
+    parser = argparse.ArgumentParser(description="Stream a business CSV into Supabase")
+    parser.add_argument("csv_file", nargs="?", default="rawbusinessdata.csv")
+    parser.add_argument("--table", default=DEFAULT_TABLE)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT)
+    parser.add_argument("--restart", action="store_true",
+                        help="ignore any existing checkpoint")
+    parser.add_argument("--replace", action="store_true",
+                        help="after a successful import, delete rows not in the CSV")
+    parser.add_argument("--duplicate-radius", type=float, default=DUPLICATE_RADIUS_M,
+                        help="meters within which rows with the same name are "
+                             "duplicates (0 only drops repeated business_ids)")
+    args = parser.parse_args()
+
     with open("import_log.txt", "w", encoding="utf-8") as log_file:
         def log(msg):
             print(msg)
@@ -156,111 +510,39 @@ def main():
         log("CSV TO SUPABASE IMPORT SCRIPT")
         log("=" * 70)
         log("")
-        
-        csv_file = "rawbusinessdata.csv"
-        
+
+        csv_file = args.csv_file
+
         if not os.path.exists(csv_file):
             log(f"Error: CSV file not found: {csv_file}")
             exit(1)
-        
+
         try:
-            # Step 1: Clear existing data
-            log("Clearing existing data from businesses table...")
-            try:
-                result = supabase.table("businesses").delete().neq("id", 0).execute()
-                log("Existing data cleared successfully")
-            except Exception as e:
-                log(f"Warning: Could not clear existing data: {e}")
-                log("   (Table might be empty, continuing...)")
-            log("")
-            
-            # Step 2: Import CSV data
-            # Inline import_csv_data logic to use the log function
-            log(f"Reading CSV file: {csv_file}")
-            
-            businesses = []
-            with open(csv_file, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                first_row = True
-                for row in reader:
-                    if first_row:
-                        print("\nDEBUG: First row raw data:")
-                        print(row)
-                        first_row = False
-        
-                    # Normalize category
-                    category = normalize_category(row['general_category'])
-                    
-                    # Build business object for 'businesses' table
-                    # Note: 'id' is auto-generated, so we don't include it
-                    business = {
-                        'business_name': row['business_name'].strip(),
-                        'general_category': category,
-                        'latitude': float(row['latitude']),
-                        'longitude': float(row['longitude']),
-                        'street': row['street'].strip(),
-                        'zone_type': row['zone_type'].strip(),
-                        'status': row['status'].strip().lower(),  # normalize to lowercase
-                    }
-                    
-                    if len(businesses) == 0:
-                        print("\nDEBUG: First constructed business object:")
-                        print(business)
-                        
-                    businesses.append(business)
-            
-            log(f"Found {len(businesses)} businesses to import")
-            
+            log(f"Streaming CSV file: {csv_file} -> {args.table}")
+            total_imported, category_counts = import_csv_data(
+                csv_file,
+                table=args.table,
+                workers=args.workers,
+                checkpoint_file=args.checkpoint,
+                restart=args.restart,
+                duplicate_radius=args.duplicate_radius,
+                log=log,
+            )
+
             # Display category distribution
-            from collections import Counter
-            categories = [b['general_category'] for b in businesses]
-            category_counts = Counter(categories)
-            log("\nCategory Distribution:")
+            log("\nCategory Distribution (rows imported in this run):")
             for cat, count in sorted(category_counts.items(), key=lambda x: -x[1]):
                 log(f"   {cat}: {count}")
             log("")
-            
-            # Import in batches (Supabase has limits)
-            BATCH_SIZE = 100
-            total_imported = 0
-            
-            for i in range(0, len(businesses), BATCH_SIZE):
-                batch = businesses[i:i + BATCH_SIZE]
-                log(f"Importing batch {i//BATCH_SIZE + 1} ({len(batch)} businesses)...")
-                
-                try:
-                    result = supabase.table("businesses").insert(batch).execute()
-                    total_imported += len(batch)
-                    log(f"   Batch imported successfully")
-                except Exception as e:
-                    log(f"   Error importing batch: {e}")
-                    raise
-            
-            log(f"\nImport complete! Total businesses imported: {total_imported}")
-            
-            # Step 3: Verify import
-            log("\nVerifying import...")
-            try:
-                # Count total businesses
-                result = supabase.table("businesses").select("*", count="exact").execute()
-                total_count = result.count
-                log(f"Total businesses in database: {total_count}")
-                
-                # Get category distribution
-                all_data = supabase.table("businesses").select("general_category").execute()
-                categories = [row['general_category'] for row in all_data.data]
-                category_counts = Counter(categories)
-                
-                log(f"Unique categories: {len(category_counts)}")
-                log("\nCategory counts in database:")
-                for cat, count in sorted(category_counts.items(), key=lambda x: -x[1]):
-                    log(f"   {cat}: {count}")
-                
-                verified = total_count == 100
-            except Exception as e:
-                log(f"Verification error: {e}")
-                verified = False
-            
+
+            business_ids = csv_business_ids(csv_file, args.duplicate_radius)
+
+            # Old rows are only removed once the new data is fully in place
+            if args.replace:
+                remove_stale_rows(args.table, business_ids, log=log)
+
+            verified = verify_import(args.table, expected=len(business_ids), log=log)
+
             log("")
             log("=" * 70)
             if verified:
@@ -268,7 +550,7 @@ def main():
             else:
                 log("IMPORT COMPLETED WITH WARNINGS")
             log("=" * 70)
-            
+
         except Exception as e:
             log("")
             log("=" * 70)
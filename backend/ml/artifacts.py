@@ -0,0 +1,250 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from features import category_codes
+from heatmap import Heatmaps
+from incremental import ModelState
+
+ARTIFACT_DIR = os.getenv(
+    "ML_ARTIFACT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "artifacts")
+)
+KEEP_VERSIONS = int(os.getenv("ML_ARTIFACT_KEEP", "5"))
+
+ARRAYS = ("centers", "cluster_counts", "category_counts")
+HEATMAP_ARRAYS = ("base", "valid", "penalty")
+LEGACY_COLUMNS = ["category_distribution", "cluster_center"]
+
+_cached_predictor = (None, None)
+
+
+class Predictor:
+    """
+    Nearest-centroid assignment plus per-cluster aggregates, computed with
+    plain numpy so a batch of points costs one (n x k) distance matrix.
+    """
+
+    def __init__(self, centers, categories, cluster_counts, category_counts):
+        self.centers = np.asarray(centers, dtype=float)
+        self.categories = list(categories)
+        self.cluster_counts = np.asarray(cluster_counts)
+        self.category_counts = np.asarray(category_counts)
+
+    @classmethod
+    def from_state(cls, state):
+        aggregates = cluster_aggregates(state)
+        return cls(
+            aggregates["centers"],
+            state.encoder.categories_[0],
+            aggregates["cluster_counts"],
+            aggregates["category_counts"],
+        )
+
+    def predict(self, latitudes, longitudes, categories):
+        n = len(latitudes)
+        codes = category_codes(categories, self.categories)
+
+        # Same layout as features.build_feature_matrix; unknown category -> all
+        # zeros. A null category is never anyone's competitor (its counts are 0)
+        features = np.zeros((n, self.centers.shape[1]))
+        features[:, 0] = latitudes
+        features[:, 1] = longitudes
+        known = codes >= 0
+        features[np.nonzero(known)[0], 2 + codes[known]] = 1.0
+
+        sq = (
+            np.einsum("ij,ij->i", features, features)[:, None]
+            - 2 * features @ self.centers.T
+            + np.einsum("ij,ij->i", self.centers, self.centers)[None, :]
+        )
+        clusters = np.argmin(sq, axis=1)
+        distance = np.sqrt(np.maximum(sq[np.arange(n), clusters], 0))
+
+        competitor = np.zeros(n, dtype=np.int64)
+        competitor[known] = self.category_counts[clusters[known], codes[known]]
+        return {
+            "cluster": clusters,
+            "distance_to_center": distance,
+            "business_density": self.cluster_counts[clusters],
+            "competitor_density": competitor,
+        }
+
+    def cluster_summary(self, cluster):
+        population = int(self.cluster_counts[cluster])
+        shares = self.category_counts[cluster] / max(population, 1)
+        order = np.argsort(-shares, kind="stable")
+        return {
+            "cluster_center": {
+                "latitude": float(self.centers[cluster][0]),
+                "longitude": float(self.centers[cluster][1]),
+            },
+            "business_density": population,
+            "category_distribution": {
+                self.categories[j]: float(shares[j]) for j in order if shares[j] > 0
+            },
+        }
+
+
+def predictor_for(state):
+    """Predictor for `state`, rebuilt only when its frame changes."""
+    global _cached_predictor
+    cached_frame, predictor = _cached_predictor
+    if cached_frame is not state.frame:
+        predictor = Predictor.from_state(state)
+        _cached_predictor = (state.frame, predictor)
+    return predictor
+
+
+def cluster_aggregates(state):
+    """
+    Centers, cluster populations and (cluster x category) counts. Rows with
+    a null category count towards population only.
+    """
+    active = state.frame[state.frame["status"] == "active"]
+    k = len(state.centers)
+    categories = list(state.encoder.categories_[0])
+    clusters = active["cluster"].astype(int).to_numpy()
+    codes = category_codes(active["general_category"], categories)
+    counted = (codes >= 0) & active["general_category"].notna().to_numpy()
+    pair = clusters[counted] * len(categories) + codes[counted]
+    return {
+        "centers": state.centers,
+        "cluster_counts": np.bincount(clusters, minlength=k),
+        "category_counts": np.bincount(
+            pair, minlength=k * len(categories)
+        ).reshape(k, len(categories)),
+    }
+
+
+def save_artifact(state, directory=ARTIFACT_DIR):
+    """
+    Write `state` as a new versioned artifact directory (vNNNNNN) and prune
+    old versions. Arrays are plain .npy files so they can be memory-mapped.
+    Returns the new version number.
+    """
+    os.makedirs(directory, exist_ok=True)
+    version = (latest_version(directory) or 0) + 1
+    target = os.path.join(directory, f"v{version:06d}")
+
+    tmp = tempfile.mkdtemp(prefix=".tmp-", dir=directory)
+    try:
+        for name, array in cluster_aggregates(state).items():
+            np.save(os.path.join(tmp, f"{name}.npy"), np.asarray(array))
+        joblib.dump(
+            {"encoder": state.encoder, "kmeans": state.kmeans},
+            os.path.join(tmp, "model.joblib"),
+        )
+        state.frame.reset_index(drop=True).to_pickle(os.path.join(tmp, "frame.pkl"))
+        heatmaps = None
+        if state.heatmaps is not None:
+            for name in HEATMAP_ARRAYS:
+                np.save(
+                    os.path.join(tmp, f"heatmap_{name}.npy"),
+                    np.asarray(getattr(state.heatmaps, name)),
+                )
+            heatmaps = {
+                "categories": state.heatmaps.categories,
+                "latitudes": state.heatmaps.latitudes.tolist(),
+                "longitudes": state.heatmaps.longitudes.tolist(),
+                "step_m": state.heatmaps.step_m,
+                "major_roads": sorted(state.heatmaps.major_roads),
+            }
+
+        metadata = {
+            "version": version,
+            "created_at": datetime.utcnow().isoformat() + "Z",
+            "k": int(len(state.centers)),
+            "categories": list(state.encoder.categories_[0]),
+            "zones": state.zones,
+            "raw_columns": state.raw_columns,
+            "fitted_rows": state.fitted_rows,
+            "fit_sq_distance": state.fit_sq_distance,
+            "changes_since_fit": state.changes_since_fit,
+            "fingerprint": state.fingerprint,
+            "last_result": state.last_result,
+            "heatmaps": heatmaps,
+        }
+        with open(os.path.join(tmp, "metadata.json"), "w", encoding="utf-8") as f:
+            json.dump(metadata, f, indent=2)
+
+        os.replace(tmp, target)
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    state.version = version
+    _prune(directory)
+    return version
+
+
+def load_latest(directory=ARTIFACT_DIR):
+    """Rebuild the newest ModelState on disk, or None if there is none."""
+    global _cached_predictor
+    version = latest_version(directory)
+    if version is None:
+        return None
+    path = os.path.join(directory, f"v{version:06d}")
+
+    with open(os.path.join(path, "metadata.json"), encoding="utf-8") as f:
+        metadata = json.load(f)
+    model = joblib.load(os.path.join(path, "model.joblib"))
+    frame = pd.read_pickle(os.path.join(path, "frame.pkl"))
+    # Artifacts written before cluster_summaries still carry per-row blobs
+    frame = frame.drop(columns=LEGACY_COLUMNS, errors="ignore")
+
+    state = ModelState(
+        model["encoder"], model["kmeans"], frame, metadata["raw_columns"], metadata["zones"]
+    )
+    state.fitted_rows = metadata["fitted_rows"]
+    state.fit_sq_distance = metadata["fit_sq_distance"]
+    state.changes_since_fit = metadata["changes_since_fit"]
+    state.fingerprint = metadata.get("fingerprint")
+    state.last_result = metadata.get("last_result")
+    state.version = version
+    # Artifacts with a single scores array (no "major_roads") are rebuilt
+    # by the service's warm-up instead
+    heatmaps = metadata.get("heatmaps")
+    if heatmaps and "major_roads" in heatmaps:
+        state.heatmaps = Heatmaps(
+            *(np.load(os.path.join(path, f"heatmap_{name}.npy"), mmap_mode="r")
+              for name in HEATMAP_ARRAYS),
+            heatmaps["categories"], heatmaps["latitudes"], heatmaps["longitudes"],
+            heatmaps["step_m"], heatmaps["major_roads"],
+        )
+
+    # Serve /predict straight from the memory-mapped aggregates
+    arrays = {
+        name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in ARRAYS
+    }
+    predictor = Predictor(
+        arrays["centers"], metadata["categories"],
+        arrays["cluster_counts"], arrays["category_counts"],
+    )
+    _cached_predictor = (state.frame, predictor)
+    return state
+
+
+def latest_version(directory=ARTIFACT_DIR):
+    versions = _versions(directory)
+    return versions[-1] if versions else None
+
+
+def _versions(directory):
+    if not os.path.isdir(directory):
+        return []
+    versions = []
+    for name in os.listdir(directory):
+        if name.startswith("v") and name[1:].isdigit():
+            versions.append(int(name[1:]))
+    return sorted(versions)
+
+
+def _prune(directory):
+    for version in _versions(directory)[:-KEEP_VERSIONS]:
+        shutil.rmtree(os.path.join(directory, f"v{version:06d}"), ignore_errors=True)
@@ -0,0 +1,225 @@
+"""
+Benchmark the training pipeline on synthetic businesses.
+
+Each run seeds a throwaway local store (storage.LocalClient) with generated
+rows and runs train.train_model() against it; the report keeps the per-stage
+timings and memory of its "profile" (fetch, encode, elbow, features, heatmap,
+write, artifact). Results go to a JSON report that can be diffed across commits:
+
+    python benchmark.py --sizes 1000,10000 --out before.json
+    python benchmark.py --sizes 1000,10000 --out after.json --compare before.json
+
+The default sizes go up to 1M rows; expect that run to take a long time.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+from profiling import max_rss_mb
+from recommend import BRGY_BOUNDS
+from source import RAW_COLUMNS
+from storage import Database, LocalClient, set_database
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+SAMPLE_CSV = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "enhanced_businessdata.csv"
+)
+# The sample data is all active; assume some closures in larger datasets
+INACTIVE_RATIO = 0.1
+# Typical spread of businesses around a commercial hotspot
+HOTSPOT_SIGMA_M = 60
+SEED_CHUNK = 5000
+
+
+def sample_mix(path=SAMPLE_CSV):
+    """Category, zone and street frequencies of the real sample data."""
+    df = pd.read_csv(path)
+    return {
+        column: df[column].value_counts(normalize=True)
+        for column in ("general_category", "zone_type", "street")
+    }
+
+
+def generate_businesses(n, seed=0, inactive_ratio=INACTIVE_RATIO, mix=None):
+    """
+    `n` business_raw rows clustered around random hotspots inside the
+    barangay bounds, with the sample category mix. Zone and street are drawn
+    per hotspot so they stay spatially coherent like the real data.
+    """
+    rng = np.random.default_rng(seed)
+    mix = mix or sample_mix()
+    hotspots = max(5, int(np.sqrt(n) / 4))
+
+    lat_min, lat_max = BRGY_BOUNDS["minLat"], BRGY_BOUNDS["maxLat"]
+    lng_min, lng_max = BRGY_BOUNDS["minLng"], BRGY_BOUNDS["maxLng"]
+    center_lat = rng.uniform(lat_min, lat_max, hotspots)
+    center_lng = rng.uniform(lng_min, lng_max, hotspots)
+    weights = rng.dirichlet(np.ones(hotspots))
+    hotspot = rng.choice(hotspots, size=n, p=weights)
+
+    sigma_lat = HOTSPOT_SIGMA_M / 111000
+    sigma_lng = HOTSPOT_SIGMA_M / (111000 * np.cos(np.radians((lat_min + lat_max) / 2)))
+    latitude = np.clip(center_lat[hotspot] + rng.normal(0, sigma_lat, n), lat_min, lat_max)
+    longitude = np.clip(center_lng[hotspot] + rng.normal(0, sigma_lng, n), lng_min, lng_max)
+
+    def draw(column, size):
+        freq = mix[column]
+        return rng.choice(freq.index.to_numpy(), size=size, p=freq.to_numpy())
+
+    categories = draw("general_category", n)
+    zones = draw("zone_type", hotspots)[hotspot]
+    streets = draw("street", hotspots)[hotspot]
+    status = np.where(rng.random(n) < inactive_ratio, "Inactive", "Active")
+    business_id = np.arange(1, n + 1)
+
+    return pd.DataFrame({
+        "business_id": business_id,
+        "business_name": [f"{c} #{i}" for c, i in zip(categories, business_id)],
+        "general_category": categories,
+        "latitude": np.round(latitude, 6),
+        "longitude": np.round(longitude, 6),
+        "street": streets,
+        "zone_type": zones,
+        "status": status,
+    }, columns=RAW_COLUMNS)
+
+
+def seed_store(client, df, table="business_raw"):
+    for start in range(0, len(df), SEED_CHUNK):
+        rows = df.iloc[start:start + SEED_CHUNK].to_dict(orient="records")
+        rows = [{k: (v.item() if hasattr(v, "item") else v) for k, v in row.items()} for row in rows]
+        client.table(table).upsert(rows, on_conflict="business_id").execute()
+
+
+def run_pipeline(client):
+    """A full train_model() run against `client`, starting from no model."""
+    import features
+    import train
+    from state import set_state
+
+    set_database(Database(client))
+    set_state(None)
+    result = train.train_model()
+    if result["status"] != "success":
+        raise RuntimeError(result.get("message", result["status"]))
+    return {
+        "active": result["active_processed"],
+        "inactive": result["inactive_ignored_in_ml"],
+        "compact": features.COMPACT_FEATURES,
+        "optimal_k": result["optimal_k"],
+        "write": result["write"],
+        **result["profile"],
+    }
+
+
+def benchmark(sizes, seed=0, inactive_ratio=INACTIVE_RATIO, memory=True, compact=False):
+    # ML_PROFILE_MEMORY is read on every train_model() run; the other
+    # settings are read at import time, before run_pipeline imports train
+    os.environ["ML_PROFILE_MEMORY"] = "1" if memory else "0"
+    if compact:
+        os.environ["ML_COMPACT_FEATURES"] = "1"
+    mix = sample_mix()
+    runs = []
+    with tempfile.TemporaryDirectory() as artifacts:
+        os.environ["ML_ARTIFACT_DIR"] = artifacts
+        for n in sizes:
+            df = generate_businesses(n, seed=seed, inactive_ratio=inactive_ratio, mix=mix)
+            with tempfile.TemporaryDirectory() as tmp:
+                client = LocalClient(os.path.join(tmp, "bench.sqlite"))
+                start = time.perf_counter()
+                seed_store(client, df)
+                seed_seconds = round(time.perf_counter() - start, 4)
+                del df
+
+                run = {"rows": n, "seed_seconds": seed_seconds, **run_pipeline(client)}
+            runs.append(run)
+            print(f"{n:>9} rows: {run['total_seconds']:.2f}s  " + "  ".join(
+                f"{name}={stage['seconds']:.2f}s" for name, stage in run["stages"].items()
+            ))
+    return runs
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "sklearn": sklearn.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(report, baseline):
+    """Print per-stage time ratios (current / baseline) for matching sizes."""
+    previous = {run["rows"]: run for run in baseline["runs"]}
+    print(f"\nvs {baseline['environment'].get('commit')}:")
+    for run in report["runs"]:
+        old = previous.get(run["rows"])
+        if old is None:
+            continue
+        parts = []
+        for name, stage in run["stages"].items():
+            before = old["stages"].get(name, {}).get("seconds")
+            if before:
+                parts.append(f"{name} x{stage['seconds'] / before:.2f}")
+        print(f"{run['rows']:>9} rows: total x{run['total_seconds'] / old['total_seconds']:.2f}  "
+              + "  ".join(parts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the training pipeline")
+    parser.add_argument("--sizes", default=",".join(str(n) for n in DEFAULT_SIZES),
+                        help="Comma-separated row counts")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--inactive-ratio", type=float, default=INACTIVE_RATIO)
+    parser.add_argument("--no-memory", action="store_true",
+                        help="Skip tracemalloc (lower overhead, timings only)")
+    parser.add_argument("--compact", action="store_true",
+                        help="Compact features (same as ML_COMPACT_FEATURES=1)")
+    parser.add_argument("--out", default="benchmark_report.json")
+    parser.add_argument("--compare", help="Earlier report to compare against")
+    args = parser.parse_args()
+
+    sizes = [int(n) for n in args.sizes.split(",") if n]
+    runs = benchmark(sizes, seed=args.seed, inactive_ratio=args.inactive_ratio,
+                     memory=not args.no_memory, compact=args.compact)
+
+    report = {
+        "generated_at": datetime.utcnow().isoformat() + "Z",
+        "environment": environment(),
+        "seed": args.seed,
+        "inactive_ratio": args.inactive_ratio,
+        "max_rss_mb": max_rss_mb(),
+        "runs": runs,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {args.out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+import json
+import os
+import threading
+
+# Model versions whose changed business_ids are kept for delta syncs
+CHANGELOG_KEEP = int(os.getenv("ML_CHANGELOG_KEEP", "500"))
+
+
+class ChangeLog:
+    """
+    business_ids inserted, updated and deleted by every model version, so a
+    client holding version N only downloads what changed since. Stored as
+    JSON lines next to the artifacts (default path); only the newest `keep`
+    versions are kept, older clients have to reload everything.
+    """
+
+    def __init__(self, path=None, keep=CHANGELOG_KEEP):
+        self._path = path
+        self.keep = keep
+        self._entries = None
+        self._lock = threading.Lock()
+
+    @property
+    def path(self):
+        if self._path is None:
+            # artifacts pulls in pandas/joblib; only load it once the log is used
+            from artifacts import ARTIFACT_DIR
+            self._path = os.path.join(ARTIFACT_DIR, "changelog.jsonl")
+        return self._path
+
+    def record(self, version, inserted=(), updated=(), deleted=()):
+        entry = {
+            "version": int(version),
+            "inserted": [int(i) for i in inserted],
+            "updated": [int(i) for i in updated],
+            "deleted": [int(i) for i in deleted],
+        }
+        with self._lock:
+            entries = self._load()
+            entries[entry["version"]] = entry
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            if len(entries) > self.keep:
+                for old in sorted(entries)[:-self.keep]:
+                    del entries[old]
+                self._rewrite(entries)
+            else:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry) + "\n")
+
+    def since(self, version, current):
+        """
+        ({business_id: "inserted" | "updated"}, [deleted business_ids]) for
+        every change after `version` up to `current`, or None when the log
+        does not cover that whole range. A `version` newer than `current`
+        (e.g. from before the artifacts were reset) raises ValueError.
+        """
+        if version > current:
+            raise ValueError(f"Version {version} is newer than the current version {current}")
+        with self._lock:
+            entries = self._load()
+            versions = range(version + 1, current + 1)
+            if any(v not in entries for v in versions):
+                return None
+
+            upserted, deleted = {}, set()
+            for v in versions:
+                entry = entries[v]
+                for business_id in entry["deleted"]:
+                    upserted.pop(business_id, None)
+                    deleted.add(business_id)
+                for kind in ("inserted", "updated"):
+                    for business_id in entry[kind]:
+                        deleted.discard(business_id)
+                        # Stays "inserted" if it first appeared in this range
+                        upserted.setdefault(business_id, kind)
+            return upserted, sorted(deleted)
+
+    def _load(self):
+        if self._entries is None:
+            self._entries = {}
+            if os.path.exists(self.path):
+                with open(self.path, encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            entry = json.loads(line)
+                            self._entries[entry["version"]] = entry
+        return self._entries
+
+    def _rewrite(self, entries):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for version in sorted(entries):
+                f.write(json.dumps(entries[version]) + "\n")
+        os.replace(tmp, self.path)
+
+
+change_log = ChangeLog()
@@ -0,0 +1,272 @@
+import copy
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import BallTree
+
+EARTH_RADIUS_M = 6371000
+
+# DensityIndex rebuilds its trees once this share of businesses is patched
+REBUILD_FRACTION = float(os.getenv("ML_DENSITY_REBUILD_FRACTION", "0.05"))
+
+# Radii used by the frontend scorer (frontend/utils/kmeans.ts)
+RADII_M = {"50m": 50, "100m": 100, "200m": 200}
+
+DENSITY_COLUMNS = [
+    f"{kind}_density_{label}"
+    for label in RADII_M
+    for kind in ("business", "competitor")
+]
+
+
+def build_tree(df):
+    """Haversine BallTree over the latitude/longitude of df."""
+    return BallTree(_radians(df["latitude"], df["longitude"]), metric="haversine")
+
+
+def radius_densities(df, rows=None, tree=None):
+    """
+    Business and same-category counts within every radius in RADII_M.
+
+    Counts for the requested rows (positions into df, default all) come from
+    count_only tree queries, which count whole nodes inside the radius
+    without listing their points, so memory stays O(rows) even when
+    thousands of businesses share a 200 m circle. Same-category counts query
+    a tree over that category only; a null category has no competitors, as
+    in features.derive_cluster_features. Counts exclude the business itself,
+    like the offline notebook. Returns {column: int array}.
+    """
+    if tree is None:
+        tree = build_tree(df)
+    rows = np.arange(len(df)) if rows is None else np.asarray(rows, dtype=np.int64)
+    latitudes = df["latitude"].to_numpy(dtype=float)
+    longitudes = df["longitude"].to_numpy(dtype=float)
+    coords = _radians(latitudes[rows], longitudes[rows])
+
+    cat_codes, _ = pd.factorize(df["general_category"])
+    row_codes = cat_codes[rows]
+
+    result = {}
+    for label, meters in RADII_M.items():
+        counts = tree.query_radius(coords, r=meters / EARTH_RADIUS_M, count_only=True)
+        result[f"business_density_{label}"] = counts.astype(np.int64) - 1
+        result[f"competitor_density_{label}"] = np.zeros(len(rows), dtype=np.int64)
+
+    for code in np.unique(row_codes[row_codes >= 0]):
+        members = np.flatnonzero(cat_codes == code)
+        category_tree = BallTree(
+            _radians(latitudes[members], longitudes[members]), metric="haversine"
+        )
+        mask = row_codes == code
+        for label, meters in RADII_M.items():
+            counts = category_tree.query_radius(
+                coords[mask], r=meters / EARTH_RADIUS_M, count_only=True
+            )
+            result[f"competitor_density_{label}"][mask] = counts - 1
+    return result
+
+
+def derive_radius_densities(df):
+    """Add every *_density_{50,100,200}m column to df."""
+    for column, values in radius_densities(df).items():
+        df[column] = values
+    return df
+
+
+class DensityIndex:
+    """
+    Positions of the active businesses for radius queries, kept across
+    incremental updates. Haversine BallTrees (all businesses, and one per
+    category on first use) are built once; businesses removed or moved
+    since are masked out of tree results and added ones are checked by
+    brute force. patched() returns a new index sharing the trees, and
+    rebuilds them once the patch outgrows REBUILD_FRACTION.
+    """
+
+    def __init__(self, business_ids, latitudes, longitudes, categories):
+        self.ids = np.asarray(business_ids)
+        self.points = np.column_stack([
+            np.asarray(latitudes, dtype=float), np.asarray(longitudes, dtype=float)
+        ])
+        self.coords = np.radians(self.points)
+        self.categories = _category_keys(categories)
+        self.tree = BallTree(self.coords, metric="haversine")
+        self.removed = np.zeros(len(self.ids), dtype=bool)
+        self.added_ids = self.ids[:0]
+        self.added_points = self.points[:0]
+        self.added_coords = self.coords[:0]
+        self.added_categories = self.categories[:0]
+        self._positions = pd.Index(self.ids)
+        self._category_trees = {}
+
+    @classmethod
+    def from_frame(cls, active):
+        return cls(
+            active["business_id"], active["latitude"], active["longitude"],
+            active["general_category"],
+        )
+
+    @property
+    def patch_size(self):
+        return int(self.removed.sum()) + len(self.added_ids)
+
+    def patched(self, removed_ids, added):
+        """Index without `removed_ids` and with the `added` rows (a frame)."""
+        removed_ids = np.asarray(list(removed_ids))
+        index = copy.copy(self)
+        index.removed = self.removed.copy()
+        positions = self._positions.get_indexer(removed_ids)
+        index.removed[positions[positions >= 0]] = True
+
+        keep = ~np.isin(self.added_ids, removed_ids)
+        added_ids = np.asarray(added["business_id"])
+        index.added_ids = np.concatenate([self.added_ids[keep], added_ids])
+        index.added_points = np.concatenate([
+            self.added_points[keep],
+            np.column_stack([
+                added["latitude"].to_numpy(dtype=float), added["longitude"].to_numpy(dtype=float)
+            ]),
+        ])
+        index.added_coords = np.radians(index.added_points)
+        index.added_categories = np.concatenate([
+            self.added_categories[keep], _category_keys(added["general_category"])
+        ])
+        if index.patch_size > REBUILD_FRACTION * max(len(self.ids), 1):
+            index = index.rebuilt()
+        return index
+
+    def rebuilt(self):
+        live = ~self.removed
+        ids = np.concatenate([self.ids[live], self.added_ids])
+        points = np.concatenate([self.points[live], self.added_points])
+        categories = np.concatenate([self.categories[live], self.added_categories])
+        return DensityIndex(ids, points[:, 0], points[:, 1], categories)
+
+    def within(self, latitude, longitude, meters):
+        """(business_ids, category keys) of the businesses within `meters`."""
+        point = _radians([latitude], [longitude])
+        radius = meters / EARTH_RADIUS_M
+        found = self.tree.query_radius(point, r=radius)[0]
+        found = found[~self.removed[found]]
+        near = _haversine(point, self.added_coords)[0] <= radius
+        return (
+            np.concatenate([self.ids[found], self.added_ids[near]]),
+            np.concatenate([self.categories[found], self.added_categories[near]]),
+        )
+
+    def counts(self, latitudes, longitudes, categories, meters):
+        """(business, same-category) counts within `meters` of each point."""
+        points = _radians(latitudes, longitudes)
+        if len(points) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        categories = _category_keys(categories)
+        radius = meters / EARTH_RADIUS_M
+        removed = self.removed.nonzero()[0]
+        gone = _haversine(points, self.coords[removed]) <= radius
+        new = _haversine(points, self.added_coords) <= radius
+
+        business = self.tree.query_radius(points, r=radius, count_only=True)
+        business = business - gone.sum(axis=1) + new.sum(axis=1)
+        competitor = np.zeros(len(points), dtype=np.int64)
+        for category in pd.unique(categories[pd.notna(categories)]):
+            mask = categories == category
+            tree = self._category_tree(category)
+            if tree is not None:
+                competitor[mask] = tree.query_radius(points[mask], r=radius, count_only=True)
+            competitor[mask] -= gone[mask][:, self.categories[removed] == category].sum(axis=1)
+            competitor[mask] += new[mask][:, self.added_categories == category].sum(axis=1)
+        return business.astype(np.int64), competitor
+
+    def _category_tree(self, category):
+        # Over the tree's original members, like self.tree; shared by patches
+        if category not in self._category_trees:
+            members = self.categories == category
+            self._category_trees[category] = (
+                BallTree(self.coords[members], metric="haversine") if members.any() else None
+            )
+        return self._category_trees[category]
+
+
+def patch_densities(frame, before, after, old_rows, new_rows):
+    """
+    Density columns after `old_rows` left the active businesses and
+    `new_rows` joined them (a moved business is in both). `before` and
+    `after` are the DensityIndex without and with the change. Businesses
+    near an old position lose one from each count that included it and
+    those near a new position gain one, so only the changed rows are
+    queried. Returns {column: Series by business_id} covering new_rows and
+    every other row whose counts changed.
+    """
+    touched = set(old_rows.index) | set(new_rows.index)
+    deltas = {column: {} for column in DENSITY_COLUMNS}
+    for rows, index, sign in ((old_rows, before, -1), (new_rows, after, 1)):
+        for business_id, latitude, longitude, category in zip(
+            rows.index, rows["latitude"], rows["longitude"],
+            _category_keys(rows["general_category"]),
+        ):
+            for label, meters in RADII_M.items():
+                ids, categories = index.within(latitude, longitude, meters)
+                competitors = ids[categories == category] if category is not None else ids[:0]
+                for column, hits in (
+                    (f"business_density_{label}", ids),
+                    (f"competitor_density_{label}", competitors),
+                ):
+                    delta = deltas[column]
+                    for neighbour in hits:
+                        if neighbour not in touched:
+                            delta[neighbour] = delta.get(neighbour, 0) + sign
+
+    # Counts include the row itself, except same-category counts of nulls
+    categorized = new_rows["general_category"].notna().to_numpy(dtype=np.int64)
+    result = {}
+    for label, meters in RADII_M.items():
+        business, competitor = after.counts(
+            new_rows["latitude"], new_rows["longitude"], new_rows["general_category"], meters
+        )
+        for column, counts in (
+            (f"business_density_{label}", business - 1),
+            (f"competitor_density_{label}", competitor - categorized),
+        ):
+            delta = pd.Series(deltas[column], dtype=np.int64)
+            delta = delta[delta != 0]
+            current = frame.loc[delta.index, column].astype(np.int64)
+            result[column] = pd.concat([
+                current + delta, pd.Series(counts, index=new_rows.index)
+            ])
+    return result
+
+
+def encode_zones(zone_type, zones=None):
+    """
+    Integer zone codes (sorted category codes, as in the notebook).
+    Returns (codes, zones); values missing from `zones` get -1.
+    """
+    if zones is None:
+        zones = sorted(zone_type.dropna().unique())
+    codes = pd.Categorical(zone_type, categories=zones).codes.astype(np.int64)
+    return codes, list(zones)
+
+
+def _category_keys(categories):
+    # Nulls become None, which is skipped: a null category has no competitors
+    keys = pd.Series(np.asarray(categories, dtype=object), dtype=object)
+    return keys.where(keys.notna(), None).to_numpy()
+
+
+def _haversine(points, others):
+    """(len(points) x len(others)) great-circle distances in radians."""
+    lat1, lng1 = points[:, :1], points[:, 1:]
+    lat2, lng2 = others[:, 0][None], others[:, 1][None]
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * np.arcsin(np.sqrt(a))
+
+
+def _radians(latitudes, longitudes):
+    return np.radians(np.column_stack([
+        np.asarray(latitudes, dtype=float),
+        np.asarray(longitudes, dtype=float),
+    ]))
@@ -0,0 +1,78 @@
+import os
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.cluster import KMeans
+
+from warmstart import seed_centers
+
+MIN_K = 2
+MAX_K = 10
+N_JOBS = int(os.getenv("ML_ELBOW_N_JOBS", "-1"))
+CRITERION = os.getenv("ML_ELBOW_CRITERION", "gradient")
+# Below this many rows, worker start-up costs more than the fits themselves
+PARALLEL_MIN_ROWS = 5000
+
+
+def gradient_criterion(ks, inertias):
+    """Original rule: k with the steepest inertia drop (argmin of gradient)."""
+    if len(ks) < 2:
+        return ks[0]
+    return ks[int(np.argmin(np.gradient(inertias)))]
+
+
+def knee_criterion(ks, inertias):
+    """Kneedle-style rule: k farthest below the line joining both ends."""
+    if len(ks) < 3:
+        return ks[0]
+    x = (np.asarray(ks, dtype=float) - ks[0]) / (ks[-1] - ks[0])
+    y = np.asarray(inertias, dtype=float)
+    span = y[0] - y[-1]
+    if span <= 0:
+        return ks[0]
+    y = (y - y[-1]) / span
+    return ks[int(np.argmax((1 - x) - y))]
+
+
+CRITERIA = {
+    "gradient": gradient_criterion,
+    "knee": knee_criterion,
+}
+
+
+def candidate_ks(n_samples, min_k=MIN_K, max_k=MAX_K):
+    # Same range as before (2..9), but never empty for tiny datasets
+    return list(range(min_k, max(min_k + 1, min(max_k, n_samples))))
+
+
+def select_k(features, criterion=None, n_jobs=None, random_state=42, init_centers=None):
+    """
+    Fit every candidate k in parallel and pick one with `criterion`.
+
+    `criterion` is a name from CRITERIA or a callable (ks, inertias) -> k.
+    With `init_centers` (a previous run's centroids) every candidate is a
+    single fit seeded from them (warmstart.seed_centers) instead of
+    n_init random restarts.
+    Returns (k, fitted KMeans for that k, {k: inertia}) so the caller can use
+    the already-fitted estimator instead of fitting the chosen k again.
+    """
+    ks = candidate_ks(features.shape[0])
+    choose = criterion if callable(criterion) else CRITERIA[criterion or CRITERION]
+
+    if n_jobs is None:
+        n_jobs = N_JOBS if features.shape[0] >= PARALLEL_MIN_ROWS else 1
+
+    models = Parallel(n_jobs=n_jobs)(
+        delayed(_fit)(features, k, random_state, init_centers) for k in ks
+    )
+    inertias = [model.inertia_ for model in models]
+
+    best_k = choose(ks, inertias)
+    return best_k, models[ks.index(best_k)], dict(zip(ks, inertias))
+
+
+def _fit(features, k, random_state, init_centers=None):
+    if init_centers is None:
+        return KMeans(n_clusters=k, random_state=random_state).fit(features)
+    init = seed_centers(init_centers, k, features, random_state)
+    return KMeans(n_clusters=k, init=init, n_init=1, random_state=random_state).fit(features)
@@ -0,0 +1,150 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Compact mode: categorical string columns while training and a float32
+# feature matrix filled from category codes. Halves the matrix and every
+# KMeans pass over it; coordinates stored in the frame stay float64.
+COMPACT_FEATURES = os.getenv("ML_COMPACT_FEATURES", "0").lower() in ("1", "true", "yes")
+COMPACT_COLUMNS = ["general_category", "street", "zone_type", "status"]
+
+# One row per cluster in the cluster_summaries table
+SUMMARY_COLUMNS = [
+    "cluster", "center_latitude", "center_longitude", "population",
+    "category_distribution", "competitor_counts",
+]
+
+
+def build_feature_matrix(encoder, df, dtype=None):
+    """Clustering features: latitude, longitude and one-hot category."""
+    if dtype is None:
+        dtype = np.float32 if COMPACT_FEATURES else np.float64
+    if np.dtype(dtype) == np.float64:
+        return np.column_stack([
+            df["latitude"].astype(float),
+            df["longitude"].astype(float),
+            encoder.transform(df[["general_category"]]),
+        ])
+
+    # Same layout, written in place from codes (no dense float64 one-hot)
+    categories = encoder.categories_[0]
+    codes = category_codes(df["general_category"], categories)
+    features = np.zeros((len(df), 2 + len(categories)), dtype=dtype)
+    features[:, 0] = df["latitude"].to_numpy(dtype=float)
+    features[:, 1] = df["longitude"].to_numpy(dtype=float)
+    known = codes >= 0
+    features[np.flatnonzero(known), 2 + codes[known]] = 1
+    return features
+
+
+def category_codes(values, categories):
+    """
+    Position of each value in the encoder's `categories`, or -1 if unknown.
+    A null value maps to the encoder's null category when it learned one
+    (pd.Categorical cannot hold a null category itself).
+    """
+    categories = list(categories)
+    nulls = pd.isna(np.asarray(categories, dtype=object))
+    known = [c for c, null in zip(categories, nulls) if not null]
+    positions = np.append(np.flatnonzero(~nulls), -1)
+    codes = positions[pd.Categorical(values, categories=known).codes]
+    if nulls.any():
+        codes[pd.isna(np.asarray(values, dtype=object))] = np.flatnonzero(nulls)[0]
+    return codes
+
+
+def compact_dtypes(df, columns=COMPACT_COLUMNS):
+    """Store low-cardinality string columns as pandas categoricals."""
+    for column in columns:
+        if column in df and df[column].dtype == object:
+            df[column] = df[column].astype("category")
+    return df
+
+
+def restore_dtypes(df, columns=COMPACT_COLUMNS):
+    """Undo compact_dtypes before rows are written or kept in ModelState."""
+    for column in columns:
+        if column in df and isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype(object)
+    return df
+
+
+def derive_cluster_features(df_active, features, clusters, centers):
+    """
+    Build every per-row ML column for the active businesses in one pass.
+
+    All per-row values are gathered from per-cluster / per-(cluster, category)
+    aggregates computed with np.bincount, so the cost is O(n) instead of the
+    O(n^2) row-by-row filtering used previously. Per-cluster values (center,
+    category mix) live in summarize_clusters, not on every row.
+    """
+    clusters = np.asarray(clusters, dtype=np.int64)
+    centers = np.asarray(centers, dtype=float)
+
+    # Distance to own cluster center (same feature space used for training)
+    df_active["distance_to_center"] = _distance_to_center(features, clusters, centers)
+
+    cluster_counts, pair_counts, _, cat_codes = _cluster_counts(
+        df_active, clusters, len(centers)
+    )
+
+    # Business density (cluster population)
+    df_active["business_density"] = cluster_counts[clusters]
+
+    # Competitor density (same category, same cluster); a null category has
+    # no competitors
+    known = cat_codes >= 0
+    competitor_density = np.zeros(len(clusters), dtype=np.int64)
+    competitor_density[known] = pair_counts[clusters[known], cat_codes[known]]
+    df_active["competitor_density"] = competitor_density
+
+    return df_active
+
+
+def summarize_clusters(df_active, clusters, centers):
+    """
+    One cluster_summaries row per cluster: lat/lng center, population and
+    the category mix as shares (descending) and as competitor counts.
+    """
+    clusters = np.asarray(clusters, dtype=np.int64)
+    centers = np.asarray(centers, dtype=float)
+    cluster_counts, pair_counts, categories, _ = _cluster_counts(
+        df_active, clusters, len(centers)
+    )
+
+    rows = []
+    for cl in range(len(centers)):
+        population = int(cluster_counts[cl])
+        order = [j for j in np.argsort(-pair_counts[cl], kind="stable") if pair_counts[cl, j] > 0]
+        rows.append({
+            "cluster": cl,
+            "center_latitude": float(centers[cl][0]),
+            "center_longitude": float(centers[cl][1]),
+            "population": population,
+            "category_distribution": {
+                categories[j]: float(pair_counts[cl, j] / max(population, 1)) for j in order
+            },
+            "competitor_counts": {categories[j]: int(pair_counts[cl, j]) for j in order},
+        })
+    return pd.DataFrame(rows, columns=SUMMARY_COLUMNS)
+
+
+def _cluster_counts(df_active, clusters, k):
+    """
+    Cluster populations, (cluster x category) counts, categories and codes.
+    Null categories get code -1 and count towards population only.
+    """
+    cat_codes, categories = pd.factorize(df_active["general_category"], sort=True)
+    n_cat = max(len(categories), 1)
+    cluster_counts = np.bincount(clusters, minlength=k)
+    known = cat_codes >= 0
+    pair_counts = np.bincount(
+        clusters[known] * n_cat + cat_codes[known], minlength=k * n_cat
+    )
+    return cluster_counts, pair_counts.reshape(k, n_cat), list(categories), cat_codes
+
+
+def _distance_to_center(features, clusters, centers):
+    diff = np.asarray(features, dtype=float) - centers[clusters]
+    return np.sqrt(np.einsum("ij,ij->i", diff, diff))
@@ -0,0 +1,51 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+# Raw columns that feed clustering or derived features. Edits to any other
+# raw column (business_name, street) are copied through without a retrain.
+MODEL_COLUMNS = [
+    "business_id", "general_category", "latitude", "longitude", "zone_type", "status",
+]
+
+
+def snapshot_fingerprint(df):
+    """
+    sha1 over MODEL_COLUMNS of a business_raw snapshot, independent of row
+    order and of status case. Equal fingerprints mean a retrain would
+    reproduce the current model exactly.
+    """
+    model = pd.DataFrame({
+        "business_id": pd.to_numeric(df["business_id"]).astype(np.int64).to_numpy(),
+        "general_category": df["general_category"].astype(object).to_numpy(),
+        "latitude": pd.to_numeric(df["latitude"]).astype(float).to_numpy(),
+        "longitude": pd.to_numeric(df["longitude"]).astype(float).to_numpy(),
+        "zone_type": df["zone_type"].astype(object).to_numpy(),
+        "status": df["status"].astype(object).str.lower().to_numpy(),
+    }, columns=MODEL_COLUMNS)
+    model = model.sort_values("business_id", kind="stable")
+    hashes = pd.util.hash_pandas_object(model, index=False).to_numpy()
+    return hashlib.sha1(hashes.tobytes()).hexdigest()
+
+
+def same_model_inputs(current, record):
+    """True when a raw `record` matches the stored row on every MODEL_COLUMNS value."""
+    for col in MODEL_COLUMNS:
+        old, new = current.get(col), record.get(col)
+        if col == "status":
+            old, new = str(old).lower(), str(new).lower()
+        elif col in ("latitude", "longitude"):
+            try:
+                old, new = float(old), float(new)
+            except (TypeError, ValueError):
+                return False
+        if _missing(old) and _missing(new):
+            continue
+        if old != new:
+            return False
+    return True
+
+
+def _missing(value):
+    return value is None or (isinstance(value, float) and np.isnan(value))
@@ -0,0 +1,240 @@
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+from density import EARTH_RADIUS_M
+from recommend import BRGY_BOUNDS, grid_axes, grid_steps
+
+HEATMAP_STEP_M = float(os.getenv("ML_HEATMAP_STEP_M", "10"))
+
+# Competitor penalty of recommend.LocationIndex.score: -(8 per competitor
+# within 100 m + 2 per competitor within 200 m)
+COMPETITOR_PENALTY = ((100, 8), (200, 2))
+
+# Businesses per vectorized block when scattering competitor counts
+SCATTER_CHUNK = 256
+
+# Farthest a business reaches into other cells' scores (road proximity)
+PATCH_RADIUS_M = 250
+
+# Frame columns LocationIndex.score reads
+SCORE_COLUMNS = ["status", "latitude", "longitude", "general_category", "zone_type", "street"]
+
+
+class Heatmaps:
+    """
+    Opportunity scores per category on a regular grid over the service area.
+    base[i, j] is the category-independent score and penalty[c, i, j] the
+    competitor penalty of categories[c] at (latitudes[i], longitudes[j]);
+    a layer is their sum, NaN where valid[i, j] is False. Kept apart so
+    update_heatmaps can patch the cells around a few changed businesses.
+    """
+
+    def __init__(self, base, valid, penalty, categories, latitudes, longitudes, step_m,
+                 major_roads=()):
+        self.base = base
+        self.valid = valid
+        self.penalty = penalty
+        self.categories = list(categories)
+        self.latitudes = np.asarray(latitudes, dtype=float)
+        self.longitudes = np.asarray(longitudes, dtype=float)
+        self.step_m = float(step_m)
+        self.major_roads = frozenset(major_roads)
+        self._positions = {c: i for i, c in enumerate(self.categories)}
+        self._layers = {}
+        self._etags = {}
+
+    def grid(self):
+        """How to read the binary layers served by /heatmaps/{category}."""
+        lat_step, lng_step = grid_steps(self.step_m)
+        return {
+            "rows": len(self.latitudes),
+            "cols": len(self.longitudes),
+            "min_latitude": float(self.latitudes[0]),
+            "min_longitude": float(self.longitudes[0]),
+            "latitude_step": lat_step,
+            "longitude_step": lng_step,
+            "step_m": self.step_m,
+            "dtype": "float32",
+            "byte_order": "little",
+            "layout": "row-major, rows by ascending latitude",
+            "invalid": "NaN",
+        }
+
+    def layer(self, category):
+        position = self._positions.get(_key(category))
+        if position is None:
+            return None
+        if position not in self._layers:
+            scores = np.where(self.valid, self.base + self.penalty[position], np.nan)
+            self._layers[position] = scores.astype(np.float32)
+        return self._layers[position]
+
+    def layer_bytes(self, category):
+        layer = self.layer(category)
+        return None if layer is None else np.ascontiguousarray(layer, dtype="<f4").tobytes()
+
+    def etag(self, category):
+        key = _key(category)
+        if key not in self._etags:
+            self._etags[key] = f'"{hashlib.sha1(self.layer_bytes(key)).hexdigest()}"'
+        return self._etags[key]
+
+    def best(self, category, top_n=5):
+        """Highest-scoring valid cells for `category`, or None if unknown."""
+        layer = self.layer(category)
+        if layer is None:
+            return None
+        flat = np.where(np.isnan(layer), -np.inf, layer).ravel()
+        order = np.argsort(-flat, kind="stable")[:top_n]
+        order = order[np.isfinite(flat[order])]
+        rows, cols = np.unravel_index(order, layer.shape)
+        return [
+            {
+                "latitude": float(self.latitudes[r]),
+                "longitude": float(self.longitudes[c]),
+                "total": float(flat[i]),
+            }
+            for i, r, c in zip(order, rows, cols)
+        ]
+
+
+def build_heatmaps(index, step_m=HEATMAP_STEP_M, bounds=BRGY_BOUNDS):
+    """
+    Heatmaps for every active category of a recommend.LocationIndex.
+
+    The category-independent terms (road proximity, POI density, zone bonus,
+    validity) are scored once for the whole grid. Competitor counts for all
+    categories come from one pass over the businesses, each adding to the
+    cells within the penalty radii around it. Distances are haversine like
+    LocationIndex.score, so every valid cell equals its exact score.
+    """
+    latitudes, longitudes = grid_axes(step_m, bounds)
+    grid_lat, grid_lng = np.meshgrid(latitudes, longitudes, indexing="ij")
+    shape = grid_lat.shape
+
+    base = index.score(grid_lat.ravel(), grid_lng.ravel(), None)
+    total = base["total"].reshape(shape)
+    valid = base["valid"].reshape(shape)
+
+    categories = _categories(index)
+    penalty = _competitor_penalty(index, categories, latitudes, longitudes, step_m, bounds)
+    return Heatmaps(
+        total, valid, penalty, categories, latitudes, longitudes, step_m, index.major_roads
+    )
+
+
+def update_heatmaps(heatmaps, index, latitudes, longitudes, categories, bounds=BRGY_BOUNDS):
+    """
+    Heatmaps for `index` after businesses at the given positions changed
+    (old and new positions, see moved_businesses). Only cells within
+    PATCH_RADIUS_M of them are re-scored, and competitor penalties only for
+    their categories. A new or vanished category, or a change in the set of
+    major roads, rebuilds everything.
+    """
+    if _categories(index) != heatmaps.categories or index.major_roads != heatmaps.major_roads:
+        return build_heatmaps(index, heatmaps.step_m, bounds)
+    if len(latitudes) == 0:
+        return heatmaps
+
+    lat_step, lng_step = grid_steps(heatmaps.step_m, bounds)
+    reach = int(np.ceil(PATCH_RADIUS_M / heatmaps.step_m)) + 1
+    rows = np.rint((np.asarray(latitudes, dtype=float) - heatmaps.latitudes[0]) / lat_step)
+    cols = np.rint((np.asarray(longitudes, dtype=float) - heatmaps.longitudes[0]) / lng_step)
+    window = np.zeros(heatmaps.valid.shape, dtype=bool)
+    for row, col in zip(rows.astype(np.int64), cols.astype(np.int64)):
+        window[max(row - reach, 0):max(row + reach + 1, 0),
+               max(col - reach, 0):max(col + reach + 1, 0)] = True
+    cells = np.nonzero(window)
+    if not len(cells[0]):
+        return heatmaps
+    cell_lat, cell_lng = heatmaps.latitudes[cells[0]], heatmaps.longitudes[cells[1]]
+
+    base_scores = index.score(cell_lat, cell_lng, None)
+    base, valid = np.array(heatmaps.base), np.array(heatmaps.valid)
+    base[cells] = base_scores["total"]
+    valid[cells] = base_scores["valid"]
+
+    penalty = np.array(heatmaps.penalty)
+    points = np.radians(np.column_stack([cell_lat, cell_lng]))
+    for category in {_key(c) for c in categories} & set(heatmaps.categories):
+        tree = index.competitor_tree(category)
+        patch = np.zeros(len(points))
+        for radius, weight in COMPETITOR_PENALTY:
+            if tree is not None:
+                patch -= weight * tree.query_radius(points, r=radius / EARTH_RADIUS_M, count_only=True)
+        penalty[heatmaps.categories.index(category)][cells] = patch
+
+    return Heatmaps(
+        base, valid, penalty, heatmaps.categories, heatmaps.latitudes, heatmaps.longitudes,
+        heatmaps.step_m, heatmaps.major_roads,
+    )
+
+
+def moved_businesses(previous, current, business_ids):
+    """
+    (latitudes, longitudes, categories) of the old and new active positions
+    of `business_ids` whose scored columns differ between two frames indexed
+    by business_id; a business missing from one frame counts as changed.
+    """
+    ids = pd.Index(business_ids).unique()
+    old = previous.reindex(ids)[SCORE_COLUMNS]
+    new = current.reindex(ids)[SCORE_COLUMNS]
+    changed = ~((old == new) | (old.isna() & new.isna())).all(axis=1).to_numpy()
+    positions = pd.concat([
+        frame[changed & (frame["status"] == "active").to_numpy()] for frame in (old, new)
+    ])
+    return (
+        positions["latitude"].to_numpy(dtype=float),
+        positions["longitude"].to_numpy(dtype=float),
+        positions["general_category"].fillna("").to_numpy(),
+    )
+
+
+def _competitor_penalty(index, categories, latitudes, longitudes, step_m, bounds):
+    shape = (len(categories), len(latitudes), len(longitudes))
+    if not categories:
+        return np.zeros(shape, dtype=np.int32)
+
+    # Each business reaches the cells in a square window around its nearest
+    # cell; the window is one cell wider than the largest radius
+    pad = int(np.ceil(max(radius for radius, _ in COMPETITOR_PENALTY) / step_m)) + 1
+    lat_step, lng_step = grid_steps(step_m, bounds)
+    positions = {c: i for i, c in enumerate(categories)}
+    codes = np.array([positions.get(c, -1) for c in index.category], dtype=np.int64)
+    known = np.flatnonzero(codes >= 0)
+    rows = np.rint((index.latitude[known] - latitudes[0]) / lat_step).astype(np.int64)
+    cols = np.rint((index.longitude[known] - longitudes[0]) / lng_step).astype(np.int64)
+
+    grid_lat, grid_lng = np.radians(latitudes), np.radians(longitudes)
+    offsets = np.arange(-pad, pad + 1)
+    penalty = np.zeros(np.prod(shape))
+    for start in range(0, len(known), SCATTER_CHUNK):
+        block = slice(start, start + SCATTER_CHUNK)
+        r = rows[block, None, None] + offsets[None, :, None]
+        c = cols[block, None, None] + offsets[None, None, :]
+        inside = (r >= 0) & (r < shape[1]) & (c >= 0) & (c < shape[2])
+        r, c = np.clip(r, 0, shape[1] - 1), np.clip(c, 0, shape[2] - 1)
+
+        lat = np.radians(index.latitude[known[block]])[:, None, None]
+        lng = np.radians(index.longitude[known[block]])[:, None, None]
+        a = (
+            np.sin((grid_lat[r] - lat) / 2) ** 2
+            + np.cos(lat) * np.cos(grid_lat[r]) * np.sin((grid_lng[c] - lng) / 2) ** 2
+        )
+        distance = 2 * np.arcsin(np.sqrt(a))
+        flat = (codes[known[block], None, None] * shape[1] + r) * shape[2] + c
+        for radius, weight in COMPETITOR_PENALTY:
+            hit = inside & (distance <= radius / EARTH_RADIUS_M)
+            penalty -= weight * np.bincount(flat[hit], minlength=len(penalty))
+    return penalty.reshape(shape).astype(np.int32)
+
+
+def _categories(index):
+    return sorted(set(index.category.tolist()) - {""})
+
+
+def _key(category):
+    return str(category).strip().lower()
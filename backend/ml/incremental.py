@@ -0,0 +1,233 @@
+import os
+
+import numpy as np
+import pandas as pd
+from features import build_feature_matrix, derive_cluster_features, summarize_clusters
+from fingerprint import MODEL_COLUMNS, same_model_inputs
+from density import DENSITY_COLUMNS, DensityIndex, encode_zones, patch_densities
+
+ML_COLUMNS = [
+    "cluster",
+    "distance_to_center",
+    "business_density",
+    "competitor_density",
+]
+
+# Full refit once this share of the fitted rows has changed incrementally
+REFIT_FRACTION = float(os.getenv("ML_REFIT_FRACTION", "0.2"))
+# ...or once mean squared distance to centers grew by this factor
+DRIFT_RATIO = float(os.getenv("ML_DRIFT_RATIO", "1.25"))
+
+
+class ModelState:
+    """
+    Fitted encoder/KMeans plus the last enhanced frame, kept in the service
+    so row-level changes can be applied without refitting.
+    """
+
+    def __init__(self, encoder, kmeans, df_all, raw_columns, zones):
+        self.encoder = encoder
+        self.kmeans = kmeans
+        self.centers = np.asarray(kmeans.cluster_centers_, dtype=float)
+        self.raw_columns = list(raw_columns)
+        self.zones = list(zones)
+        self.frame = df_all.set_index("business_id", drop=False)
+
+        active = self.frame[self.frame["status"] == "active"]
+        self.fitted_rows = len(active)
+        self.fit_sq_distance = _mean_sq_distance(active)
+        self.changes_since_fit = 0
+        # Artifact version on disk (set by artifacts.save_artifact/load_latest)
+        self.version = None
+        # snapshot_fingerprint of the raw rows behind `frame`, and the result
+        # of the run that produced it (returned again for no-op retrains)
+        self.fingerprint = None
+        self.last_result = None
+        # heatmap.Heatmaps for `frame` (set by the training pipeline)
+        self.heatmaps = None
+        self._density_index = None
+
+    @property
+    def density_index(self):
+        """density.DensityIndex over the active rows, patched by apply_events."""
+        if self._density_index is None:
+            self._density_index = DensityIndex.from_frame(
+                self.frame[self.frame["status"] == "active"]
+            )
+        return self._density_index
+
+    def cluster_summaries(self):
+        """summarize_clusters over the current active rows."""
+        active = self.frame[self.frame["status"] == "active"]
+        return summarize_clusters(active, active["cluster"].astype(int), self.centers)
+
+    @property
+    def passthrough_columns(self):
+        return [col for col in self.raw_columns if col not in MODEL_COLUMNS]
+
+    def refresh_passthrough(self, df):
+        """
+        Copy non-model raw columns (name, street) from a snapshot with the
+        same fingerprint into the frame. Returns the rows that changed.
+        """
+        columns = self.passthrough_columns
+        current = self.frame[columns]
+        fresh = df.set_index("business_id")[columns].reindex(current.index)
+        same = (fresh == current) | (fresh.isna() & current.isna())
+        differs = ~same.all(axis=1)
+        if not differs.any():
+            return self.frame.iloc[:0].reset_index(drop=True)
+
+        frame = self.frame.copy()
+        frame.loc[differs, columns] = fresh.loc[differs]
+        self.frame = frame
+        return frame.loc[differs].reset_index(drop=True)
+
+    def apply_events(self, events):
+        """
+        Apply row changes and return (changed_rows, removed_ids), or None when
+        a full refit is required (unknown category/zone, size or drift
+        threshold). Only clusters that gained or lost members, and radius
+        densities around the old and new positions, are recomputed.
+        """
+        removed, upserts = set(), {}
+        for op, record, old_record in events:
+            if op == "DELETE":
+                business_id = (old_record or record or {}).get("business_id")
+                if business_id is not None:
+                    removed.add(business_id)
+                    upserts.pop(business_id, None)
+            elif record and record.get("business_id") is not None:
+                upserts[record["business_id"]] = {
+                    col: record.get(col) for col in self.raw_columns
+                }
+                removed.discard(record["business_id"])
+
+        # Re-saves and name/street edits: copy the values, skip the model
+        base, passthrough_ids = self.frame, []
+        for business_id in [b for b in upserts if b in self.frame.index]:
+            current = self.frame.loc[business_id]
+            if not same_model_inputs(current, upserts[business_id]):
+                continue
+            record = upserts.pop(business_id)
+            edits = {
+                col: record[col] for col in self.passthrough_columns
+                if current[col] != record[col]
+            }
+            if edits:
+                if base is self.frame:
+                    base = self.frame.copy()
+                for col, value in edits.items():
+                    base.at[business_id, col] = value
+                passthrough_ids.append(business_id)
+
+        if not upserts and not removed:
+            self.frame = base
+            changed = base.loc[base.index.isin(passthrough_ids)]
+            return changed.reset_index(drop=True), []
+
+        touched = removed | set(upserts)
+        changes = self.changes_since_fit + len(touched)
+        if changes > REFIT_FRACTION * max(self.fitted_rows, 1):
+            return None
+
+        frame = base
+        existing = frame.index.intersection(list(touched))
+        old_clusters = frame.loc[existing, "cluster"].dropna().astype(int)
+
+        new = pd.DataFrame(list(upserts.values()), columns=self.raw_columns)
+        new["status"] = new["status"].str.lower()
+        new["latitude"] = pd.to_numeric(new["latitude"])
+        new["longitude"] = pd.to_numeric(new["longitude"])
+        new = new[new["status"].isin(["active", "inactive"])]
+        new = new.set_index("business_id", drop=False)
+        # Rows whose status left active/inactive drop out of the table
+        removed |= set(upserts) - set(new.index)
+
+        new_active = new[new["status"] == "active"]
+        known = set(self.encoder.categories_[0])
+        if not new_active["general_category"].isin(known).all():
+            return None
+        if not new["zone_type"].isin(self.zones).all():
+            return None
+
+        for col in ML_COLUMNS + DENSITY_COLUMNS:
+            new[col] = None
+        new["zone_encoded"] = encode_zones(new["zone_type"], self.zones)[0]
+        if len(new_active):
+            labels = self.kmeans.predict(
+                build_feature_matrix(self.encoder, new_active, self.kmeans.cluster_centers_.dtype)
+            )
+            new["cluster"] = new["cluster"].astype(object)
+            new.loc[new_active.index, "cluster"] = labels
+        else:
+            labels = np.empty(0, dtype=int)
+
+        frame = pd.concat([frame.drop(index=existing), new])
+        active = frame[frame["status"] == "active"]
+        if len(active) < 2:
+            return None
+
+        # Recompute features only for clusters that gained or lost members
+        affected = set(old_clusters.tolist()) | set(int(x) for x in labels)
+        subset = active[active["cluster"].isin(affected)].copy()
+        if len(subset):
+            subset_clusters = subset["cluster"].astype(int).to_numpy()
+            subset = derive_cluster_features(
+                subset,
+                build_feature_matrix(self.encoder, subset, self.kmeans.cluster_centers_.dtype),
+                subset_clusters,
+                self.centers,
+            )
+            subset["cluster"] = subset_clusters
+            for col in ML_COLUMNS:
+                frame[col] = frame[col].astype(object)
+                frame.loc[subset.index, col] = subset[col]
+
+        # Patch radius densities around every old and new position against
+        # the persistent index instead of recounting every neighbour
+        active = frame[frame["status"] == "active"]
+        old_active = self.frame.loc[existing]
+        old_active = old_active[old_active["status"] == "active"]
+        density_index = self.density_index.patched(old_active.index, new_active)
+        densities = patch_densities(
+            frame, self.density_index, density_index, old_active, new_active
+        )
+        for col, values in densities.items():
+            frame[col] = frame[col].astype(object)
+            frame.loc[values.index, col] = values
+
+        if _mean_sq_distance(active) > DRIFT_RATIO * self.fit_sq_distance:
+            return None
+
+        candidates = (
+            set(subset.index) | set(new.index) | set(passthrough_ids)
+            | {business_id for values in densities.values() for business_id in values.index}
+        )
+        # Cluster features are recomputed for whole clusters; only rows whose
+        # stored values moved (or that are new) are written
+        changed_ids = _changed_ids(self.frame, frame, candidates)
+        self.frame = frame
+        self.changes_since_fit = changes
+        self._density_index = density_index
+
+        changed = frame.loc[frame.index.isin(changed_ids)]
+        return changed.reset_index(drop=True), sorted(removed)
+
+
+def _changed_ids(previous, current, candidates):
+    """Candidates that are new in `current` or differ from `previous` in any column."""
+    ids = current.index.intersection(list(candidates))
+    known = ids.intersection(previous.index)
+    columns = current.columns.intersection(previous.columns)
+    old = previous.loc[known, columns]
+    new = current.loc[known, columns]
+    same = ((old == new) | (old.isna() & new.isna())).all(axis=1)
+    return set(ids.difference(known)) | set(known[~same.to_numpy()])
+
+
+def _mean_sq_distance(active):
+    distances = pd.to_numeric(active["distance_to_center"], errors="coerce").to_numpy(dtype=float)
+    if len(distances) == 0:
+        return 0.0
+    return float(np.nanmean(distances ** 2))
@@ -0,0 +1,178 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+MAX_HISTORY = 50
+
+
+def parse_events(payload):
+    """
+    Extract (type, record, old_record) tuples from a webhook payload.
+
+    Accepts a single Supabase database-webhook body
+    ({"type", "table", "record", "old_record"}) or {"events": [...]} holding
+    several of them. Returns None when the payload carries no row changes,
+    which means "run a full retrain".
+    """
+    if not isinstance(payload, dict):
+        return None
+    items = payload.get("events") if "events" in payload else [payload]
+    events = []
+    for item in items or []:
+        if not isinstance(item, dict) or item.get("table", "business_raw") != "business_raw":
+            continue
+        op = str(item.get("type", "")).upper()
+        if op not in ("INSERT", "UPDATE", "DELETE"):
+            continue
+        events.append((op, item.get("record"), item.get("old_record")))
+    return events or None
+
+
+def _now():
+    return datetime.utcnow().isoformat() + "Z"
+
+
+class TrainingQueue:
+    """
+    Debounced, single-worker queue for training runs.
+
+    Every submit() inside the debounce window joins the same pending job, so
+    a burst of row-level webhooks (one per CSV row) produces one retrain. At
+    most one job runs at a time; events arriving while it runs are coalesced
+    into the next pending job. `max_wait_seconds` bounds how long a
+    continuous stream of events can postpone a pending job.
+
+    `run` is called with the row-change events collected for the job, or
+    with None when any submit() asked for a full retrain. `on_finish`, if
+    given, receives the public job dict after every run.
+    """
+
+    def __init__(self, run, debounce_seconds=5.0, max_wait_seconds=30.0, on_finish=None):
+        self._run = run
+        self._on_finish = on_finish
+        self.debounce_seconds = debounce_seconds
+        self.max_wait_seconds = max_wait_seconds
+
+        self._jobs = OrderedDict()
+        self._pending = None
+        self._running = None
+        self._latest_id = None
+        self._cond = threading.Condition()
+        self._worker = threading.Thread(target=self._loop, name="training-queue", daemon=True)
+        self._worker.start()
+
+    def submit(self, trigger="raw_data_change", changes=None):
+        with self._cond:
+            now = time.monotonic()
+            job = self._pending
+            if job is None:
+                job = {
+                    "job_id": uuid.uuid4().hex,
+                    "status": "queued",
+                    "trigger": trigger,
+                    "events": 0,
+                    "created_at": _now(),
+                    "started_at": None,
+                    "finished_at": None,
+                    "duration_seconds": None,
+                    "result": None,
+                    "error": None,
+                }
+                job["_first_event"] = now
+                job["_changes"] = []
+                self._pending = job
+                self._remember(job)
+            job["events"] += 1
+            if changes is None or job["_changes"] is None:
+                job["_changes"] = None
+            else:
+                job["_changes"].extend(changes)
+            job["_last_event"] = now
+            self._cond.notify()
+            return self._public(job)
+
+    def get(self, job_id):
+        with self._cond:
+            job = self._jobs.get(job_id)
+            return self._public(job) if job else None
+
+    def latest(self):
+        """Most recently finished job, or the current one if none finished yet."""
+        with self._cond:
+            if self._latest_id is not None:
+                return self._public(self._jobs[self._latest_id])
+            if self._jobs:
+                return self._public(next(reversed(self._jobs.values())))
+            return None
+
+    def jobs(self):
+        """Every remembered job, oldest first."""
+        with self._cond:
+            return [self._public(job) for job in self._jobs.values()]
+
+    def depth(self):
+        """Number of jobs waiting or running (0, 1 or 2)."""
+        with self._cond:
+            return int(self._pending is not None) + int(self._running is not None)
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while True:
+                    job = self._pending
+                    if job is None:
+                        self._cond.wait()
+                        continue
+                    due = min(
+                        job["_last_event"] + self.debounce_seconds,
+                        job["_first_event"] + self.max_wait_seconds,
+                    )
+                    remaining = due - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+                self._pending = None
+                self._running = job
+                job["status"] = "running"
+                job["started_at"] = _now()
+
+            start = time.perf_counter()
+            try:
+                result = self._run(job["_changes"])
+                status, error = "succeeded", None
+                if isinstance(result, dict) and result.get("status") == "error":
+                    status = "failed"
+                    error = result.get("message")
+            except Exception as e:
+                result, status, error = None, "failed", f"{type(e).__name__}: {e}"
+
+            with self._cond:
+                job["status"] = status
+                job["result"] = result
+                job["error"] = error
+                job["finished_at"] = _now()
+                job["duration_seconds"] = round(time.perf_counter() - start, 4)
+                self._running = None
+                self._latest_id = job["job_id"]
+                finished = self._public(job)
+
+            if self._on_finish is not None:
+                try:
+                    self._on_finish(finished)
+                except Exception:
+                    pass
+
+    def _remember(self, job):
+        self._jobs[job["job_id"]] = job
+        while len(self._jobs) > MAX_HISTORY:
+            oldest = next(iter(self._jobs))
+            if oldest in (self._latest_id, job["job_id"]):
+                break
+            del self._jobs[oldest]
+
+    @staticmethod
+    def _public(job):
+        return {k: v for k, v in job.items() if not k.startswith("_")}
@@ -0,0 +1,278 @@
+"""
+Load-test the ML service in-process against a local stand-in database.
+
+The FastAPI app is driven through httpx's ASGI transport and storage is a
+throwaway LocalClient seeded with synthetic businesses (benchmark.py), so
+no server or Supabase project is needed. Requests arrive open-loop at
+--rate per second, spread over the endpoints by --mix; --pattern burst also
+fires a CSV-upload-sized burst of row webhooks at /train every
+--burst-interval seconds. Latency is measured from each request's scheduled
+arrival, so time spent waiting for one of the --concurrency slots counts:
+
+    python loadtest.py --rows 10000 --rate 50 --duration 30 --out load.json
+    python loadtest.py --pattern burst --burst-size 500 --burst-interval 10
+
+The JSON report has throughput, p50/p95/p99 latency and error rates per
+endpoint, plus what the training queue did with the webhooks. Webhooks only
+carry events; the store is not modified, as if the rows were re-saved. The
+HTTP server (uvicorn) is not part of the measurement.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+from urllib.parse import quote
+
+import httpx
+import numpy as np
+
+from benchmark import environment, generate_businesses, sample_mix, seed_store
+from profiling import max_rss_mb
+from recommend import BRGY_BOUNDS
+from storage import Database, LocalClient, set_database
+
+ENDPOINTS = ("predict", "recommend", "stats", "heatmap", "status", "train")
+DEFAULT_MIX = "predict=4,stats=2,heatmap=2,status=1,recommend=1,train=1"
+DRAIN_TIMEOUT = 300
+
+
+class RequestFactory:
+    """Randomised requests for each of ENDPOINTS."""
+
+    def __init__(self, frame, categories, rng, predict_batch=10):
+        self.frame = frame.reset_index(drop=True)
+        self.categories = list(categories)
+        self.rng = rng
+        self.predict_batch = predict_batch
+
+    def build(self, name):
+        """(method, path, json body or None) for one `name` request."""
+        return getattr(self, name)()
+
+    def predict(self):
+        n = self.predict_batch
+        latitudes = self.rng.uniform(BRGY_BOUNDS["minLat"], BRGY_BOUNDS["maxLat"], n)
+        longitudes = self.rng.uniform(BRGY_BOUNDS["minLng"], BRGY_BOUNDS["maxLng"], n)
+        points = [
+            {"latitude": float(lat), "longitude": float(lng), "general_category": self._category()}
+            for lat, lng in zip(latitudes, longitudes)
+        ]
+        return "POST", "/predict", {"points": points}
+
+    def recommend(self):
+        return "POST", "/recommend", {"category": self._category(), "top_n": 5}
+
+    def stats(self):
+        return "GET", "/stats", None
+
+    def heatmap(self):
+        return "GET", f"/heatmaps/{quote(self._category().lower())}", None
+
+    def status(self):
+        return "GET", "/train/latest", None
+
+    def train(self):
+        # Supabase database webhook for an edited business_raw row
+        old = self.frame.iloc[int(self.rng.integers(len(self.frame)))].to_dict()
+        old = {k: (v.item() if hasattr(v, "item") else v) for k, v in old.items()}
+        record = dict(old)
+        record["latitude"] = round(old["latitude"] + self.rng.normal(0, 0.0001), 6)
+        record["longitude"] = round(old["longitude"] + self.rng.normal(0, 0.0001), 6)
+        body = {"type": "UPDATE", "table": "business_raw", "record": record, "old_record": old}
+        return "POST", "/train", body
+
+    def _category(self):
+        return self.categories[int(self.rng.integers(len(self.categories)))]
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint in --mix: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def arrival_plan(pattern, duration, rate, mix, rng, burst_size=0, burst_interval=0):
+    """
+    (offset seconds, endpoint name) for every request of the run, in order:
+    Poisson arrivals at `rate` drawn from `mix`, plus for pattern "burst"
+    `burst_size` /train webhooks at once every `burst_interval` seconds.
+    """
+    names = list(mix)
+    weights = np.array([mix[name] for name in names], dtype=float)
+    expected = int(rate * duration)
+    gaps = rng.exponential(1 / rate, size=expected + 10 * int(np.sqrt(expected) + 10))
+    offsets = np.cumsum(gaps)
+    offsets = offsets[offsets < duration]
+    plan = list(zip(offsets.tolist(), rng.choice(names, len(offsets), p=weights / weights.sum())))
+
+    if pattern == "burst":
+        for offset in np.arange(0, duration, burst_interval):
+            plan += [(float(offset), "train")] * burst_size
+    return sorted(plan, key=lambda item: item[0])
+
+
+async def drive(app, plan, factory, concurrency):
+    """Send every planned request; returns (samples, wall seconds)."""
+    samples = []
+    slots = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as http:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+
+        async def fire(offset, name):
+            await asyncio.sleep(max(0.0, start + offset - loop.time()))
+            async with slots:
+                method, path, body = factory.build(name)
+                try:
+                    response = await http.request(method, path, json=body, timeout=None)
+                    status, error = response.status_code, None
+                    if status >= 400:
+                        error = f"HTTP {status}"
+                except Exception as e:
+                    status, error = None, type(e).__name__
+            samples.append({
+                "endpoint": name,
+                "latency": loop.time() - (start + offset),
+                "status": status,
+                "error": error,
+            })
+
+        await asyncio.gather(*(fire(offset, name) for offset, name in plan))
+        wall = loop.time() - start
+    return samples, wall
+
+
+def summarize(samples, wall):
+    """Throughput, latency percentiles and error rate of `samples`."""
+    if not samples:
+        return {"requests": 0}
+    latency_ms = np.array([s["latency"] for s in samples]) * 1000
+    errors = Counter(s["error"] for s in samples if s["error"])
+    p50, p95, p99 = np.percentile(latency_ms, [50, 95, 99])
+    return {
+        "requests": len(samples),
+        "throughput_rps": round(len(samples) / wall, 3),
+        "latency_ms": {
+            "mean": round(float(latency_ms.mean()), 3),
+            "p50": round(float(p50), 3),
+            "p95": round(float(p95), 3),
+            "p99": round(float(p99), 3),
+            "max": round(float(latency_ms.max()), 3),
+        },
+        "errors": sum(errors.values()),
+        "error_rate": round(sum(errors.values()) / len(samples), 6),
+        "error_types": dict(errors),
+        "status_codes": dict(Counter(str(s["status"]) for s in samples)),
+    }
+
+
+def training_summary(queue):
+    jobs = [job for job in queue.jobs() if job["status"] in ("succeeded", "failed")]
+    durations = [job["duration_seconds"] for job in jobs]
+    return {
+        "jobs": len(jobs),
+        "statuses": dict(Counter(job["status"] for job in jobs)),
+        "modes": dict(Counter((job["result"] or {}).get("mode") for job in jobs)),
+        "events": sum(job["events"] for job in jobs),
+        "max_duration_seconds": max(durations, default=None),
+        "pending": queue.depth(),
+    }
+
+
+def run(args):
+    rng = np.random.default_rng(args.seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # The service reads these at import time
+        os.environ["ML_ARTIFACT_DIR"] = os.path.join(tmp, "artifacts")
+        os.environ["ML_TRAIN_DEBOUNCE_SECONDS"] = str(args.debounce)
+
+        df = generate_businesses(args.rows, seed=args.seed, mix=sample_mix())
+        client = LocalClient(os.path.join(tmp, "loadtest.sqlite"))
+        seed_store(client, df)
+        set_database(Database(client))
+
+        import main
+        import train
+
+        start = time.perf_counter()
+        train.train_model()
+        train_seconds = round(time.perf_counter() - start, 4)
+
+        categories = df["general_category"].dropna().unique()
+        factory = RequestFactory(df, categories, rng, predict_batch=args.predict_batch)
+        plan = arrival_plan(args.pattern, args.duration, args.rate, args.mix, rng,
+                            args.burst_size, args.burst_interval)
+        print(f"{len(plan)} requests over {args.duration}s ({args.pattern}), "
+              f"initial train {train_seconds:.2f}s")
+
+        samples, wall = asyncio.run(drive(main.app, plan, factory, args.concurrency))
+
+        # Let coalesced webhooks finish so the training summary is complete
+        deadline = time.monotonic() + DRAIN_TIMEOUT
+        while main.training_queue.depth() and time.monotonic() < deadline:
+            time.sleep(0.2)
+
+        endpoints = {}
+        for name in sorted({s["endpoint"] for s in samples}):
+            endpoints[name] = summarize([s for s in samples if s["endpoint"] == name], wall)
+
+        return {
+            "generated_at": datetime.utcnow().isoformat() + "Z",
+            "environment": environment(),
+            "config": vars(args),
+            "initial_train_seconds": train_seconds,
+            "wall_seconds": round(wall, 4),
+            "overall": summarize(samples, wall),
+            "endpoints": endpoints,
+            "training": training_summary(main.training_queue),
+            "max_rss_mb": max_rss_mb(),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the ML service in-process")
+    parser.add_argument("--rows", type=int, default=10000, help="Synthetic businesses to seed")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pattern", choices=("steady", "burst"), default="steady")
+    parser.add_argument("--rate", type=float, default=20, help="Mean arrivals per second")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of arrivals")
+    parser.add_argument("--concurrency", type=int, default=16, help="Max requests in flight")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help="Endpoint weights, name=weight for any of " + ", ".join(ENDPOINTS))
+    parser.add_argument("--burst-size", type=int, default=200,
+                        help="Webhooks per simulated CSV upload (--pattern burst)")
+    parser.add_argument("--burst-interval", type=float, default=10)
+    parser.add_argument("--debounce", type=float, default=1,
+                        help="ML_TRAIN_DEBOUNCE_SECONDS for the service under test")
+    parser.add_argument("--predict-batch", type=int, default=10, help="Points per /predict")
+    parser.add_argument("--out", default="loadtest_report.json")
+    args = parser.parse_args()
+
+    report = run(args)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    overall = report["overall"]
+    for name, stats in [("overall", overall), *report["endpoints"].items()]:
+        latency = stats["latency_ms"]
+        print(f"{name:>10}: {stats['requests']:>6} req  {stats['throughput_rps']:>8.2f} rps  "
+              f"p50={latency['p50']:.1f}ms  p95={latency['p95']:.1f}ms  "
+              f"p99={latency['p99']:.1f}ms  errors={stats['error_rate']:.2%}")
+    print(f"training: {report['training']}")
+    print(f"\nReport written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
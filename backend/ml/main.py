@@ -1,6 +1,32 @@
-from fastapi import FastAPI
+import time
+
+# Start of the startup-time budget: everything below, up to the startup
+# event, has to stay cheap. pandas, scikit-learn and the database client are
+# only imported by the warm-up thread or the first request that needs them.
+IMPORT_STARTED = time.perf_counter()
+
+import logging
+import os
+from typing import List, Optional
+
+from dotenv import load_dotenv
+from fastapi import Body, FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from train import train_model
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+from starlette.routing import Match
+import metrics
+from jobs import TrainingQueue, parse_events
+from state import get_state, set_state_if_none
+from stats import stats_cache
+from changes import change_log
+from warmup import Warmup
+
+load_dotenv(override=True)
+
+logger = logging.getLogger(__name__)
+
+STARTUP_BUDGET_SECONDS = float(os.getenv("ML_STARTUP_BUDGET_SECONDS", "1"))
 
 app = FastAPI()
 
@@ -13,7 +39,311 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-@app.post("/train")
-def train_endpoint():
-    result = train_model()
-    return result
+# Request bodies
+class Point(BaseModel):
+    latitude: float
+    longitude: float
+
+class RecommendRequest(BaseModel):
+    category: str
+    candidates: Optional[List[Point]] = None
+    # None -> recommend.DEFAULT_GRID_STEP_M
+    grid_step_m: Optional[float] = None
+    top_n: int = 5
+
+class PredictPoint(Point):
+    general_category: Optional[str] = None
+
+class PredictRequest(BaseModel):
+    points: List[PredictPoint]
+
+def run_training(changes):
+    from train import update_model
+    return update_model(changes)
+
+# Webhooks fire once per business_raw row; coalesce them into one retrain
+training_queue = TrainingQueue(
+    run_training,
+    debounce_seconds=float(os.getenv("ML_TRAIN_DEBOUNCE_SECONDS", "5")),
+    max_wait_seconds=float(os.getenv("ML_TRAIN_MAX_WAIT_SECONDS", "30")),
+    on_finish=metrics.observe_training,
+)
+
+HEATMAP_MAX_AGE = int(os.getenv("ML_HEATMAP_MAX_AGE", "60"))
+
+metrics.Gauge(
+    "ml_training_queue_depth", "Training jobs waiting or running.",
+    function=training_queue.depth,
+)
+metrics.Gauge(
+    "ml_model_version", "Version of the model being served.",
+    function=lambda: getattr(get_state(), "version", None),
+)
+
+startup = {"seconds": None}
+
+def _import_models():
+    import train  # noqa: F401 (pandas, scikit-learn, scipy, model code)
+
+def _load_model():
+    # Warm start from the newest artifact written by a previous run
+    if get_state() is None:
+        from artifacts import load_latest
+        state = load_latest()
+        # A training job may have published a newer model while this loaded
+        if state is not None and set_state_if_none(state):
+            stats_cache.rebuild(state.frame, state.version)
+
+def _build_indexes():
+    state = get_state()
+    if state is not None:
+        from artifacts import predictor_for
+        from recommend import index_for
+        index = index_for(state.frame)
+        predictor_for(state)
+        if state.heatmaps is None:
+            from heatmap import build_heatmaps
+            state.heatmaps = build_heatmaps(index)
+
+def _open_database():
+    from storage import get_database
+    get_database()
+
+warmup = Warmup([
+    ("imports", _import_models),
+    ("model", _load_model),
+    ("indexes", _build_indexes),
+    ("database", _open_database),
+], started=IMPORT_STARTED)
+
+metrics.Gauge(
+    "ml_startup_seconds", "Seconds from importing the service to accepting requests.",
+    function=lambda: startup["seconds"],
+)
+metrics.Gauge(
+    "ml_ready_seconds", "Seconds from importing the service to the end of warm-up.",
+    function=lambda: warmup.ready_seconds,
+)
+
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    metrics.REQUEST_LATENCY.observe(
+        time.perf_counter() - start,
+        method=request.method,
+        path=_route_path(request),
+        status=response.status_code,
+    )
+    return response
+
+def _route_path(request):
+    # Route template (/train/{job_id}) keeps label cardinality bounded
+    for route in app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+@app.on_event("startup")
+def start_warmup():
+    warmup.start()
+    startup["seconds"] = round(time.perf_counter() - IMPORT_STARTED, 4)
+    if startup["seconds"] > STARTUP_BUDGET_SECONDS:
+        logger.warning(
+            "Startup took %.2fs, over the %.2fs budget", startup["seconds"], STARTUP_BUDGET_SECONDS
+        )
+
+# In-memory endpoints are async so they are answered on the event loop,
+# without waiting for a worker thread, while a training job runs
+
+@app.get("/health")
+async def health():
+    """The process is up and accepting requests."""
+    return {
+        "status": "ok",
+        "startup_seconds": startup["seconds"],
+        "startup_budget_seconds": STARTUP_BUDGET_SECONDS,
+    }
+
+@app.get("/ready")
+async def ready():
+    """200 once warm-up has finished and a model with its indexes is loaded."""
+    state = get_state()
+    body = {
+        "ready": warmup.done and state is not None,
+        "model_version": getattr(state, "version", None),
+        "warmup": warmup.report(),
+    }
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.post("/train", status_code=202)
+async def train_endpoint(payload: dict = Body(None)):
+    # Webhook bodies carrying row changes are applied incrementally
+    return training_queue.submit(changes=parse_events(payload))
+
+@app.get("/train/latest")
+async def latest_training():
+    job = training_queue.latest()
+    if job is None:
+        raise HTTPException(status_code=404, detail="No training job has been submitted")
+    return job
+
+@app.get("/train/{job_id}")
+async def training_status(job_id: str):
+    job = training_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Training job not found")
+    return job
+
+@app.get("/stats")
+async def stats_endpoint(request: Request):
+    if get_state() is None:
+        raise HTTPException(status_code=503, detail="Model has not been trained yet")
+
+    # Counts change only when the model does; clients revalidate with the ETag
+    payload, etag = stats_cache.snapshot()
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in _etags(request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(payload, headers=headers)
+
+def _etags(header):
+    if not header:
+        return set()
+    return {tag.strip().removeprefix("W/") for tag in header.split(",")}
+
+@app.get("/heatmaps")
+async def heatmaps_index():
+    state, heatmaps = _heatmaps()
+    return {
+        "model_version": state.version,
+        "grid": heatmaps.grid(),
+        "categories": heatmaps.categories,
+    }
+
+# Categories may contain "/" (e.g. "entertainment / leisure"), hence :path
+@app.get("/heatmaps/{category:path}/best")
+async def heatmap_best(category: str, top_n: int = Query(5, ge=1, le=100)):
+    state, heatmaps = _heatmaps()
+    best = heatmaps.best(category, top_n)
+    if best is None:
+        raise HTTPException(status_code=404, detail="No heatmap for this category")
+    return {"model_version": state.version, "category": category, "recommendations": best}
+
+@app.get("/heatmaps/{category:path}")
+async def heatmap_layer(category: str, request: Request):
+    state, heatmaps = _heatmaps()
+    if heatmaps.layer(category) is None:
+        raise HTTPException(status_code=404, detail="No heatmap for this category")
+
+    # float32 grid, see /heatmaps for the layout; only changes on retrain
+    etag = heatmaps.etag(category)
+    grid = heatmaps.grid()
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={HEATMAP_MAX_AGE}",
+        "X-Model-Version": str(state.version),
+        "X-Grid-Shape": f"{grid['rows']},{grid['cols']}",
+    }
+    if etag in _etags(request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=headers)
+    return Response(
+        heatmaps.layer_bytes(category), media_type="application/octet-stream", headers=headers
+    )
+
+def _heatmaps():
+    state = get_state()
+    if state is None or state.heatmaps is None:
+        raise HTTPException(status_code=503, detail="Model has not been trained yet")
+    return state, state.heatmaps
+
+@app.get("/businesses/changes")
+def business_changes(since: int = Query(..., ge=0)):
+    """Enhanced business rows inserted/updated and ids deleted after model version `since`."""
+    state = get_state()
+    if state is None or state.version is None:
+        raise HTTPException(status_code=503, detail="Model has not been trained yet")
+
+    if since > state.version:
+        # The client saw a model this service no longer knows, e.g. after the
+        # artifact directory was reset
+        raise HTTPException(
+            status_code=400,
+            detail=f"Version {since} is newer than the current model version "
+                   f"{state.version}; reload all businesses",
+        )
+    delta = change_log.since(since, state.version)
+    if delta is None:
+        raise HTTPException(
+            status_code=410,
+            detail="Changes since this version are no longer available; reload all businesses",
+        )
+    from writer import json_rows
+
+    upserted, deleted = delta
+    present = [business_id for business_id in upserted if business_id in state.frame.index]
+    rows = json_rows(state.frame.loc[present].reset_index(drop=True))
+    return {
+        "since": since,
+        "model_version": state.version,
+        "inserted": [row for row in rows if upserted[row["business_id"]] == "inserted"],
+        "updated": [row for row in rows if upserted[row["business_id"]] == "updated"],
+        "deleted": deleted,
+    }
+
+@app.post("/recommend")
+def recommend_endpoint(request: RecommendRequest):
+    from recommend import DEFAULT_GRID_STEP_M, MIN_GRID_STEP_M, index_for, recommend
+
+    state = get_state()
+    if state is None:
+        raise HTTPException(status_code=503, detail="Model has not been trained yet")
+    grid_step_m = DEFAULT_GRID_STEP_M if request.grid_step_m is None else request.grid_step_m
+    if grid_step_m < MIN_GRID_STEP_M or request.top_n < 1:
+        raise HTTPException(
+            status_code=422,
+            detail=f"grid_step_m must be >= {MIN_GRID_STEP_M} and top_n >= 1",
+        )
+
+    candidates = [c.dict() for c in request.candidates or []]
+    try:
+        return recommend(
+            index_for(state.frame),
+            request.category,
+            candidates=candidates,
+            grid_step_m=grid_step_m,
+            top_n=request.top_n,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@app.post("/predict")
+def predict_endpoint(request: PredictRequest):
+    import numpy as np
+    from artifacts import predictor_for
+
+    state = get_state()
+    if state is None:
+        raise HTTPException(status_code=503, detail="Model has not been trained yet")
+
+    predictor = predictor_for(state)
+    points = request.points
+    predicted = predictor.predict(
+        np.array([p.latitude for p in points]),
+        np.array([p.longitude for p in points]),
+        [p.general_category for p in points],
+    )
+
+    predictions = [
+        {key: values[i].item() for key, values in predicted.items()}
+        for i in range(len(points))
+    ]
+    clusters = {
+        int(c): predictor.cluster_summary(int(c)) for c in np.unique(predicted["cluster"])
+    }
+    return {"model_version": state.version, "predictions": predictions, "clusters": clusters}
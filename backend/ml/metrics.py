@@ -0,0 +1,197 @@
+"""
+Minimal Prometheus text-format metrics (exposition format 0.0.4) for the ML
+service, served by GET /metrics. Kept dependency-free; the metric names and
+semantics follow prometheus_client so the collector can be swapped in.
+"""
+
+import math
+import threading
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+TRAINING_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+    def _label_text(self, key, extra=()):
+        pairs = list(zip(self.labels, key)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        with self._lock:
+            lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        return [
+            f"{self.name}{self._label_text(key)} {_number(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(_Metric):
+    """Gauge set explicitly, or read from `function` at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labels=(), function=None):
+        super().__init__(name, documentation, labels)
+        self.function = function
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def _samples(self):
+        if self.function is not None:
+            return [f"{self.name} {_number(self.function())}"]
+        return [
+            f"{self.name}{self._label_text(key)} {_number(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=REQUEST_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    def _samples(self):
+        lines = []
+        for key, (counts, total) in sorted(self._values.items()):
+            for bound, count in zip(self.buckets, counts):
+                le = "+Inf" if math.isinf(bound) else _number(bound)
+                lines.append(f"{self.name}_bucket{self._label_text(key, [('le', le)])} {count}")
+            lines.append(f"{self.name}_sum{self._label_text(key)} {_number(total)}")
+            lines.append(f"{self.name}_count{self._label_text(key)} {counts[-1]}")
+        return lines
+
+
+REGISTRY = []
+
+
+def render():
+    """Every registered metric in Prometheus text format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def _number(value):
+    if value is None:
+        return "NaN"
+    value = float(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(int(value)) if value.is_integer() else repr(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+# --- Service metrics -----------------------------------------------------------
+
+REQUEST_LATENCY = Histogram(
+    "ml_http_request_duration_seconds",
+    "HTTP request latency by route.",
+    ["method", "path", "status"],
+)
+TRAINING_DURATION = Histogram(
+    "ml_training_duration_seconds",
+    "Wall time of finished training jobs.",
+    ["mode", "status"],
+    buckets=TRAINING_BUCKETS,
+)
+TRAINING_STAGE_DURATION = Histogram(
+    "ml_training_stage_duration_seconds",
+    "Wall time of each training pipeline stage.",
+    ["mode", "stage"],
+    buckets=TRAINING_BUCKETS,
+)
+TRAINING_ROWS = Gauge(
+    "ml_training_rows",
+    "Businesses in the last successful training run.",
+    ["status"],
+)
+TRAINING_MAX_RSS = Gauge(
+    "ml_training_max_rss_megabytes",
+    "Process RSS high-water mark after the last training run.",
+)
+ROWS_WRITTEN = Counter(
+    "ml_rows_written_total",
+    "Rows written to the businesses table.",
+    ["op"],
+)
+TRAINING_JOBS = Counter(
+    "ml_training_jobs_total",
+    "Finished training jobs.",
+    ["mode", "status"],
+)
+
+
+def observe_training(job):
+    """Record a finished TrainingQueue job."""
+    result = job.get("result") or {}
+    mode = result.get("mode", "unknown")
+    status = job.get("status", "unknown")
+
+    TRAINING_JOBS.inc(mode=mode, status=status)
+    if job.get("duration_seconds") is not None:
+        TRAINING_DURATION.observe(job["duration_seconds"], mode=mode, status=status)
+
+    profile = result.get("profile") or {}
+    for stage, record in profile.get("stages", {}).items():
+        TRAINING_STAGE_DURATION.observe(record["seconds"], mode=mode, stage=stage)
+    if profile.get("max_rss_mb") is not None:
+        TRAINING_MAX_RSS.set(profile["max_rss_mb"])
+
+    write = result.get("write") or {}
+    for op in ("upserted", "deleted"):
+        if write.get(op):
+            ROWS_WRITTEN.inc(write[op], op=op)
+
+    if status == "succeeded":
+        TRAINING_ROWS.set(result.get("active_processed", 0), status="active")
+        TRAINING_ROWS.set(result.get("inactive_ignored_in_ml", 0), status="inactive")
@@ -0,0 +1,131 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.cluster import KMeans
+from sklearn.metrics import pairwise_distances_argmin
+
+from elbow import PARALLEL_MIN_ROWS, select_k
+
+# "none" clusters everything together (the original behaviour), "geohash"
+# tiles by geohash prefix, any other value names a fetched business_raw
+# column (source.RAW_COLUMNS) to partition by, e.g. zone_type
+PARTITION = os.getenv("ML_PARTITION", "none")
+GEOHASH_PRECISION = int(os.getenv("ML_GEOHASH_PRECISION", "5"))
+PARTITION_WORKERS = int(os.getenv("ML_PARTITION_WORKERS", "0")) or os.cpu_count()
+
+_BASE32 = np.array(list("0123456789bcdefghjkmnpqrstuvwxyz"))
+
+
+class PartitionedKMeans:
+    """
+    Per-partition KMeans fits merged into one model. Cluster ids are made
+    globally unique by offsetting each partition's labels; `partitions`
+    maps partition key -> (first cluster id, k). predict() assigns the
+    nearest center of any partition, so it can be used like KMeans by the
+    incremental path and the artifacts.
+    """
+
+    def __init__(self, cluster_centers, labels, inertia, partitions):
+        self.cluster_centers_ = cluster_centers
+        self.labels_ = labels
+        self.inertia_ = inertia
+        self.n_clusters = len(cluster_centers)
+        self.partitions = partitions
+
+    def predict(self, X):
+        return pairwise_distances_argmin(
+            np.asarray(X, dtype=self.cluster_centers_.dtype), self.cluster_centers_
+        )
+
+
+def check_partition(columns, mode=None):
+    """Raise ValueError unless `mode` (see PARTITION) is usable with `columns`."""
+    mode = mode or PARTITION
+    if mode not in ("none", "geohash") and mode not in columns:
+        raise ValueError(
+            f"ML_PARTITION={mode!r}: expected none, geohash or one of {', '.join(columns)}"
+        )
+
+
+def partition_keys(df, mode=None, precision=None):
+    """Partition key per row of df for `mode` (see PARTITION)."""
+    mode = mode or PARTITION
+    check_partition(list(df.columns), mode)
+    if mode == "geohash":
+        return geohash(df["latitude"], df["longitude"], precision or GEOHASH_PRECISION)
+    # Compact frames hold the column as a Categorical, which rejects ""
+    return df[mode].astype(object).fillna("").astype(str).to_numpy()
+
+
+def fit_partitioned(features, keys, max_workers=None):
+    """
+    Run the elbow search independently for every partition, in a process
+    pool, and merge the fits into a PartitionedKMeans.
+
+    Returns (model, {key: k}).
+    """
+    keys = np.asarray(keys)
+    order = sorted(set(keys.tolist()))
+    members = [np.flatnonzero(keys == key) for key in order]
+
+    max_workers = max_workers or PARTITION_WORKERS
+    if len(order) > 1 and max_workers > 1 and len(features) >= PARALLEL_MIN_ROWS:
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(order))) as pool:
+            fits = list(pool.map(_fit_partition, (features[rows] for rows in members)))
+    else:
+        fits = [_fit_partition(features[rows]) for rows in members]
+
+    labels = np.empty(len(features), dtype=np.int64)
+    centers, partitions, inertia, offset = [], {}, 0.0, 0
+    for key, rows, (local_labels, local_centers, local_inertia) in zip(order, members, fits):
+        labels[rows] = local_labels + offset
+        centers.append(local_centers)
+        partitions[key] = (offset, len(local_centers))
+        inertia += local_inertia
+        offset += len(local_centers)
+
+    model = PartitionedKMeans(np.vstack(centers), labels, inertia, partitions)
+    return model, {key: k for key, (_, k) in partitions.items()}
+
+
+def _fit_partition(features):
+    # Too small for the elbow search: a single cluster
+    if len(features) < 3:
+        model = KMeans(n_clusters=1, n_init=1, random_state=42).fit(features)
+    else:
+        # Partitions already run in parallel; keep each elbow search serial
+        _, model, _ = select_k(features, n_jobs=1)
+    return model.labels_.astype(np.int64), model.cluster_centers_, float(model.inertia_)
+
+
+def geohash(latitudes, longitudes, precision):
+    """Vectorized geohash strings of `precision` characters."""
+    lat = np.asarray(latitudes, dtype=float)
+    lng = np.asarray(longitudes, dtype=float)
+    lat_lo, lat_hi = np.full(len(lat), -90.0), np.full(len(lat), 90.0)
+    lng_lo, lng_hi = np.full(len(lng), -180.0), np.full(len(lng), 180.0)
+
+    chars = []
+    even = True
+    for _ in range(precision):
+        code = np.zeros(len(lat), dtype=np.int64)
+        for _ in range(5):
+            # Bits alternate longitude / latitude, longitude first
+            if even:
+                mid = (lng_lo + lng_hi) / 2
+                bit = lng >= mid
+                lng_lo = np.where(bit, mid, lng_lo)
+                lng_hi = np.where(bit, lng_hi, mid)
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                bit = lat >= mid
+                lat_lo = np.where(bit, mid, lat_lo)
+                lat_hi = np.where(bit, lat_hi, mid)
+            code = (code << 1) | bit
+            even = not even
+        chars.append(_BASE32[code])
+
+    if not chars:
+        return np.full(len(lat), "", dtype=object)
+    return np.array(["".join(c) for c in zip(*chars)], dtype=object)
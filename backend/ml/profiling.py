@@ -0,0 +1,83 @@
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def profile_memory():
+    """
+    Whether ML_PROFILE_MEMORY is set. tracemalloc roughly doubles allocation
+    cost, so the service only samples RSS high-water marks unless it is.
+    Read per run rather than at import, so callers such as benchmark.py can
+    switch it on after the service modules are loaded.
+    """
+    return os.getenv("ML_PROFILE_MEMORY", "0").lower() in ("1", "true", "yes")
+
+
+class StageProfiler:
+    """
+    Collects wall time, row counts and peak traced memory per named stage:
+
+        with profiler.stage("fetch") as record:
+            df = read_table(...)
+            record["rows"] = len(df)
+
+    With memory=True, peak_mb is what tracemalloc sees allocated during the
+    stage (numpy buffers included); work done in joblib worker processes is
+    not traced. rss_mb, the process RSS high-water mark after the stage, is
+    always recorded: a stage that raises it set a new peak.
+    """
+
+    def __init__(self, memory=True):
+        self.memory = memory
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        record = {"rows": rows}
+        started = False
+        if self.memory:
+            if tracemalloc.is_tracing():
+                tracemalloc.reset_peak()
+            else:
+                tracemalloc.start()
+                started = True
+            baseline = tracemalloc.get_traced_memory()[0]
+
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = round(time.perf_counter() - start, 4)
+            if self.memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                record["peak_mb"] = round(max(peak - baseline, 0) / 2 ** 20, 2)
+                if started:
+                    tracemalloc.stop()
+            record["rss_mb"] = max_rss_mb()
+            self.stages[name] = record
+
+    def total_seconds(self):
+        return round(sum(record["seconds"] for record in self.stages.values()), 4)
+
+    def report(self):
+        return {
+            "stages": {name: dict(record) for name, record in self.stages.items()},
+            "total_seconds": self.total_seconds(),
+            "max_rss_mb": max_rss_mb(),
+        }
+
+
+def max_rss_mb():
+    """Process high-water RSS in MB, or None where getrusage is unavailable."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux
+    return round(rss / (2 ** 20 if sys.platform == "darwin" else 2 ** 10), 1)
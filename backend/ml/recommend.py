@@ -0,0 +1,235 @@
+import numpy as np
+from sklearn.neighbors import BallTree
+
+from density import EARTH_RADIUS_M
+
+# Service area (mirrors BRGY_BOUNDS / STA_CRUZ_POLYGON in frontend/utils/kmeans.ts)
+BRGY_BOUNDS = {
+    "minLat": 14.8338,
+    "maxLat": 14.8413,
+    "minLng": 120.9518,
+    "maxLng": 120.9608,
+}
+
+STA_CRUZ_POLYGON = np.array([
+    (14.8340, 120.9520),
+    (14.8340, 120.9605),
+    (14.8380, 120.9608),
+    (14.8410, 120.9600),
+    (14.8413, 120.9560),
+    (14.8405, 120.9520),
+    (14.8370, 120.9518),
+])
+
+DEFAULT_GRID_STEP_M = 25
+MAX_CANDIDATES = 20000
+
+_cached_index = (None, None)
+
+
+class LocationIndex:
+    """
+    In-memory spatial index over the active businesses of the latest model,
+    used to score many candidate locations at once.
+    """
+
+    def __init__(self, frame):
+        active = frame[frame["status"] == "active"]
+        self.latitude = active["latitude"].to_numpy(dtype=float)
+        self.longitude = active["longitude"].to_numpy(dtype=float)
+        self.category = active["general_category"].fillna("").str.strip().str.lower().to_numpy()
+        self.zone_type = active["zone_type"].fillna("").str.lower().to_numpy()
+
+        streets = active["street"].fillna("").str.strip().str.lower()
+        streets = streets.where(streets != "", "unknown")
+        street_counts = streets.value_counts()
+        threshold = max(3, int(street_counts.sum() // max(len(street_counts), 1)))
+        self.major_roads = frozenset(street_counts[street_counts >= threshold].index)
+        self.on_major_road = streets.isin(self.major_roads).to_numpy()
+
+        self.tree = BallTree(_radians(self.latitude, self.longitude), metric="haversine")
+        self.road_tree = _tree_or_none(self.on_major_road, self.latitude, self.longitude)
+        self._competitor_trees = {}
+
+    def competitor_tree(self, category):
+        key = category.strip().lower()
+        if key not in self._competitor_trees:
+            mask = self.category == key
+            self._competitor_trees[key] = _tree_or_none(mask, self.latitude, self.longitude)
+        return self._competitor_trees[key]
+
+    def score(self, latitudes, longitudes, category):
+        """
+        Vectorized port of computeLocationScore + isValidLocation for every
+        candidate. Returns a dict of equally long numpy arrays.
+        """
+        latitudes = np.asarray(latitudes, dtype=float)
+        longitudes = np.asarray(longitudes, dtype=float)
+        points = _radians(latitudes, longitudes)
+        n = len(points)
+
+        # Nearest business (zone bonus + "near an existing business" checks)
+        nearest_dist, nearest_idx = self.tree.query(points, k=1)
+        nearest_km = nearest_dist[:, 0] * EARTH_RADIUS_M / 1000
+        nearest_zone = self.zone_type[nearest_idx[:, 0]].astype(str)
+
+        # 1. Road proximity (0-25)
+        road_proximity = np.zeros(n)
+        if self.road_tree is not None:
+            road_dist, _ = self.road_tree.query(points, k=1)
+            road_km = road_dist[:, 0] * EARTH_RADIUS_M / 1000
+            road_proximity = np.maximum(0, 25 * (1 - road_km / 0.25))
+
+        # 2. POI density (0-30)
+        pois_100m = self.tree.query_radius(points, r=_rad(100), count_only=True)
+        poi_density = np.minimum(30, pois_100m * 3)
+
+        # 3. Competitor penalty
+        comp_100m = np.zeros(n, dtype=np.int64)
+        comp_200m = np.zeros(n, dtype=np.int64)
+        # category=None scores without the competitor penalty
+        comp_tree = self.competitor_tree(category) if category is not None else None
+        if comp_tree is not None:
+            comp_100m = comp_tree.query_radius(points, r=_rad(100), count_only=True)
+            comp_200m = comp_tree.query_radius(points, r=_rad(200), count_only=True)
+        competitor_penalty = -(comp_100m * 8 + comp_200m * 2)
+
+        # 4. Zone bonus (0-20) from the nearest business within 100 m
+        commercial = np.char.find(nearest_zone, "commercial") >= 0
+        commercial |= np.char.find(nearest_zone, "business") >= 0
+        mixed = np.char.find(nearest_zone, "mixed") >= 0
+        mixed |= np.char.find(nearest_zone, "residential") >= 0
+        zone_bonus = np.where(commercial, 20, np.where(mixed, 10, 0))
+        zone_bonus = np.where(nearest_km < 0.1, zone_bonus, 0)
+
+        # Validity: inside bounds, inside polygon (or within 50 m of a
+        # business) and at least one business within 200 m
+        in_bounds = (
+            (latitudes >= BRGY_BOUNDS["minLat"]) & (latitudes <= BRGY_BOUNDS["maxLat"]) &
+            (longitudes >= BRGY_BOUNDS["minLng"]) & (longitudes <= BRGY_BOUNDS["maxLng"])
+        )
+        in_polygon = points_in_polygon(latitudes, longitudes, STA_CRUZ_POLYGON)
+        # A business within 200 m exactly when the nearest one is
+        near_any = nearest_dist[:, 0] <= _rad(200)
+        valid = in_bounds & (in_polygon | (nearest_km <= 0.05)) & near_any
+
+        total = road_proximity + poi_density + competitor_penalty + zone_bonus
+        return {
+            "total": total,
+            "roadProximity": road_proximity,
+            "poiDensity": poi_density,
+            "competitorPenalty": competitor_penalty,
+            "zoneBonus": zone_bonus,
+            "competitorsWithin100m": comp_100m,
+            "competitorsWithin200m": comp_200m,
+            "valid": valid,
+        }
+
+
+def index_for(frame):
+    """LocationIndex for `frame`, rebuilt only when the frame object changes."""
+    global _cached_index
+    cached_frame, index = _cached_index
+    if cached_frame is not frame:
+        index = LocationIndex(frame)
+        _cached_index = (frame, index)
+    return index
+
+
+def grid_steps(step_m=DEFAULT_GRID_STEP_M, bounds=BRGY_BOUNDS):
+    """(lat_step, lng_step) in degrees for cells roughly step_m apart."""
+    mid_lat = np.radians((bounds["minLat"] + bounds["maxLat"]) / 2)
+    return step_m / 111000, step_m / (111000 * np.cos(mid_lat))
+
+
+def grid_axes(step_m=DEFAULT_GRID_STEP_M, bounds=BRGY_BOUNDS):
+    """Latitudes and longitudes of the grid over the service area."""
+    lat_step, lng_step = grid_steps(step_m, bounds)
+    lats = np.arange(bounds["minLat"], bounds["maxLat"] + 1e-12, lat_step)
+    lngs = np.arange(bounds["minLng"], bounds["maxLng"] + 1e-12, lng_step)
+    return lats, lngs
+
+
+def grid_candidates(step_m=DEFAULT_GRID_STEP_M, bounds=BRGY_BOUNDS):
+    """Regular lat/lng grid over the service area, roughly step_m apart."""
+    lats, lngs = grid_axes(step_m, bounds)
+    grid_lat, grid_lng = np.meshgrid(lats, lngs, indexing="ij")
+    return grid_lat.ravel(), grid_lng.ravel()
+
+
+def grid_size(step_m, bounds=BRGY_BOUNDS):
+    lats, lngs = grid_axes(step_m, bounds)
+    return len(lats) * len(lngs)
+
+
+# Finest whole-metre grid that fits in MAX_CANDIDATES; /recommend rejects finer
+MIN_GRID_STEP_M = next(
+    step for step in range(1, DEFAULT_GRID_STEP_M + 1) if grid_size(step) <= MAX_CANDIDATES
+)
+
+
+def recommend(index, category, candidates=None, grid_step_m=DEFAULT_GRID_STEP_M, top_n=5):
+    """
+    Score a dense grid (plus any caller-supplied candidates) for `category`
+    and return the best valid locations with their score breakdown.
+    """
+    latitudes, longitudes = grid_candidates(grid_step_m)
+    if candidates:
+        latitudes = np.concatenate([latitudes, [c["latitude"] for c in candidates]])
+        longitudes = np.concatenate([longitudes, [c["longitude"] for c in candidates]])
+    if len(latitudes) > MAX_CANDIDATES:
+        raise ValueError(f"Too many candidates ({len(latitudes)} > {MAX_CANDIDATES})")
+
+    scores = index.score(latitudes, longitudes, category)
+    ranked = np.where(scores["valid"], scores["total"], -np.inf)
+    order = np.argsort(-ranked, kind="stable")[:top_n]
+    order = order[np.isfinite(ranked[order])]
+
+    results = []
+    for i in order:
+        result = {"latitude": float(latitudes[i]), "longitude": float(longitudes[i])}
+        for key, values in scores.items():
+            if key != "valid":
+                result[key] = values[i].item()
+        results.append(result)
+
+    return {
+        "category": category,
+        "candidates_scored": int(len(latitudes)),
+        "valid_candidates": int(scores["valid"].sum()),
+        "recommendations": results,
+    }
+
+
+def points_in_polygon(latitudes, longitudes, polygon):
+    """Ray-casting point-in-polygon test, vectorized over points."""
+    x = np.asarray(longitudes, dtype=float)
+    y = np.asarray(latitudes, dtype=float)
+    inside = np.zeros(len(x), dtype=bool)
+    j = len(polygon) - 1
+    for i in range(len(polygon)):
+        yi, xi = polygon[i]
+        yj, xj = polygon[j]
+        crosses = (yi > y) != (yj > y)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x_cross = (xj - xi) * (y - yi) / (yj - yi) + xi
+        inside ^= crosses & (x < x_cross)
+        j = i
+    return inside
+
+
+def _tree_or_none(mask, latitudes, longitudes):
+    if not mask.any():
+        return None
+    return BallTree(_radians(latitudes[mask], longitudes[mask]), metric="haversine")
+
+
+def _rad(meters):
+    return meters / EARTH_RADIUS_M
+
+
+def _radians(latitudes, longitudes):
+    return np.radians(np.column_stack([
+        np.asarray(latitudes, dtype=float),
+        np.asarray(longitudes, dtype=float),
+    ]))
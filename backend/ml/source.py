@@ -0,0 +1,131 @@
+import asyncio
+import math
+
+import numpy as np
+import pandas as pd
+
+from storage import as_database
+
+# PostgREST caps responses at max-rows (1000 by default on Supabase)
+PAGE_SIZE = 1000
+
+RAW_COLUMNS = [
+    "business_id", "business_name", "general_category", "latitude",
+    "longitude", "street", "zone_type", "status",
+]
+
+RAW_DTYPES = {
+    "business_id": np.int64,
+    "latitude": np.float64,
+    "longitude": np.float64,
+}
+
+
+def read_table(client, table, columns, key="business_id", dtypes=None, page_size=PAGE_SIZE):
+    """Blocking read_table_async for a client or storage.Database."""
+    db = as_database(client)
+    return db.run(read_table_async(db, table, columns, key, dtypes, page_size))
+
+
+async def read_table_async(db, table, columns, key="business_id", dtypes=None,
+                           page_size=PAGE_SIZE):
+    """
+    Read `columns` of `table` into a DataFrame using keyset pagination.
+
+    The key range is split into about one slice per page and slices are
+    fetched concurrently (as many at once as the Database allows); each
+    slice keeps paginating (key > last key) until it is exhausted, so skewed
+    keys are still read completely. Every page is converted straight into
+    typed column arrays and dropped, so no list of row dicts for the whole
+    table is ever held in memory.
+    """
+    columns = list(columns)
+    if key not in columns:
+        columns.insert(0, key)
+    dtypes = dtypes or {}
+    select = ", ".join(columns)
+
+    bounds = await _key_bounds(db, table, key)
+    if bounds is None:
+        return _empty_frame(columns, dtypes)
+    low, high, count = bounds
+
+    if isinstance(low, (int, np.integer)) and isinstance(high, (int, np.integer)):
+        slices = _split_range(low, high, max(1, math.ceil(count / page_size)))
+    else:
+        slices = [(None, None)]
+
+    async def fetch(slice_bounds):
+        start, stop = slice_bounds
+        builder = _ColumnBuilder(columns, dtypes)
+        last = None
+        while True:
+            query = db.table(table).select(select).order(key)
+            if last is not None:
+                query = query.gt(key, last)
+            elif start is not None:
+                query = query.gte(key, start)
+            if stop is not None:
+                query = query.lt(key, stop)
+            page = (await db.execute(query.limit(page_size))).data or []
+            if page:
+                builder.add(page)
+                last = page[-1][key]
+            if len(page) < page_size:
+                return builder
+
+    builders = await asyncio.gather(*(fetch(s) for s in slices))
+    return _ColumnBuilder.merge(builders, columns, dtypes)
+
+
+async def _key_bounds(db, table, key):
+    first, last = await asyncio.gather(
+        db.execute(db.table(table).select(key, count="exact").order(key).limit(1)),
+        db.execute(db.table(table).select(key).order(key, desc=True).limit(1)),
+    )
+    if not first.data:
+        return None
+    count = first.count if first.count is not None else PAGE_SIZE
+    return first.data[0][key], last.data[0][key], count
+
+
+def _split_range(low, high, parts):
+    # Half-open [start, stop) slices covering low..high inclusive
+    edges = np.linspace(low, high + 1, parts + 1).astype(np.int64)
+    edges = np.unique(edges)
+    return [(int(a), int(b)) for a, b in zip(edges[:-1], edges[1:])]
+
+
+class _ColumnBuilder:
+    """Accumulates pages as per-column numpy chunks."""
+
+    def __init__(self, columns, dtypes):
+        self.columns = columns
+        self.dtypes = dtypes
+        self.chunks = {col: [] for col in columns}
+
+    def add(self, page):
+        for col in self.columns:
+            dtype = self.dtypes.get(col, object)
+            values = [row.get(col) for row in page]
+            if np.issubdtype(np.dtype(dtype), np.floating):
+                values = [np.nan if v is None else v for v in values]
+            self.chunks[col].append(np.asarray(values, dtype=dtype))
+
+    @staticmethod
+    def merge(builders, columns, dtypes):
+        data = {}
+        for col in columns:
+            parts = [chunk for builder in builders for chunk in builder.chunks[col]]
+            if parts:
+                data[col] = np.concatenate(parts)
+            else:
+                data[col] = np.empty(0, dtype=dtypes.get(col, object))
+        return pd.DataFrame(data, columns=columns)
+
+
+def _empty_frame(columns, dtypes):
+    return pd.DataFrame(
+        {col: np.empty(0, dtype=dtypes.get(col, object)) for col in columns},
+        columns=columns,
+    )
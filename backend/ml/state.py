@@ -0,0 +1,31 @@
+import threading
+
+# The served ModelState (incremental.ModelState). Kept apart from the model
+# code so the service can check for a model without importing pandas/sklearn.
+_state = None
+_state_lock = threading.Lock()
+
+
+def get_state():
+    with _state_lock:
+        return _state
+
+
+def set_state(state):
+    global _state
+    with _state_lock:
+        _state = state
+
+
+def set_state_if_none(state):
+    """
+    set_state(state) unless a state is already being served, e.g. one a
+    training job published while this one was loading. Returns whether it
+    was set.
+    """
+    global _state
+    with _state_lock:
+        if _state is not None:
+            return False
+        _state = state
+        return True
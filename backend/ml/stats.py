@@ -0,0 +1,121 @@
+import hashlib
+import json
+import threading
+from collections import Counter
+
+# Frame column -> key in the /stats payload
+STAT_COLUMNS = {
+    "general_category": "categories",
+    "zone_type": "zones",
+    "status": "statuses",
+}
+
+
+class StatsCache:
+    """
+    Category, zone and status counts over the enhanced businesses, global
+    and per cluster. rebuild() recounts a whole frame after a full retrain;
+    apply() adjusts the counts for the rows an incremental update touched,
+    using the per-business values remembered from the previous count. A
+    rebuild() for an older model version than the one counted is ignored.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rows = {}
+        self._global = {}
+        self._clusters = {}
+        self.revision = 0
+        self.model_version = None
+        self._payload = None
+
+    def rebuild(self, frame, model_version=None):
+        with self._lock:
+            counted = self.model_version
+            if None not in (model_version, counted) and model_version < counted:
+                return
+            self._rows = {}
+            self._global = {key: Counter() for key in STAT_COLUMNS.values()}
+            self._clusters = {}
+            for row in _stat_rows(frame):
+                self._add(row)
+            self._touch(model_version)
+
+    def apply(self, changed_rows, removed_ids, model_version=None):
+        with self._lock:
+            for business_id in removed_ids:
+                self._remove(business_id)
+            for row in _stat_rows(changed_rows):
+                self._remove(row["business_id"])
+                self._add(row)
+            self._touch(model_version)
+
+    def snapshot(self):
+        """(payload, etag); the payload is rebuilt only after a change."""
+        with self._lock:
+            if self._payload is None:
+                payload = {
+                    "model_version": self.model_version,
+                    "revision": self.revision,
+                    "total": len(self._rows),
+                    **{key: _sorted(counter) for key, counter in self._global.items()},
+                    "clusters": {
+                        str(cluster): {
+                            "total": sum(counters["statuses"].values()),
+                            **{key: _sorted(counter) for key, counter in counters.items()},
+                        }
+                        for cluster, counters in sorted(self._clusters.items())
+                    },
+                }
+                body = json.dumps(payload, sort_keys=True).encode("utf-8")
+                self._payload = (payload, f'"{hashlib.sha1(body).hexdigest()}"')
+            return self._payload
+
+    def _add(self, row):
+        self._rows[row["business_id"]] = row
+        self._count(row, 1)
+
+    def _remove(self, business_id):
+        row = self._rows.pop(business_id, None)
+        if row is not None:
+            self._count(row, -1)
+
+    def _count(self, row, delta):
+        targets = [self._global]
+        if row["cluster"] is not None:
+            targets.append(self._clusters.setdefault(
+                row["cluster"], {key: Counter() for key in STAT_COLUMNS.values()}
+            ))
+        for counters in targets:
+            for column, key in STAT_COLUMNS.items():
+                counter = counters[key]
+                counter[row[column]] += delta
+                if counter[row[column]] <= 0:
+                    del counter[row[column]]
+        cluster = row["cluster"]
+        if cluster is not None and not any(self._clusters[cluster]["statuses"].values()):
+            del self._clusters[cluster]
+
+    def _touch(self, model_version):
+        self.revision += 1
+        if model_version is not None:
+            self.model_version = model_version
+        self._payload = None
+
+
+def _stat_rows(frame):
+    columns = ["business_id", "cluster", *STAT_COLUMNS]
+    for record in frame[columns].to_dict(orient="records"):
+        cluster = record["cluster"]
+        record["cluster"] = None if cluster is None or cluster != cluster else int(cluster)
+        for column in STAT_COLUMNS:
+            value = record[column]
+            record[column] = "" if value is None or value != value else str(value)
+        yield record
+
+
+def _sorted(counter):
+    return dict(sorted(counter.items(), key=lambda item: (-item[1], item[0])))
+
+
+stats_cache = StatsCache()
@@ -0,0 +1,451 @@
+"""
+Storage backends shared by the ML service and the backend scripts.
+
+get_client() returns either the Supabase client or LocalClient, a SQLite-file
+stand-in that implements the subset of the Supabase/PostgREST query builder
+used in this repo (select/insert/upsert/delete, eq/neq/gt/gte/lt/lte/in_
+filters, order, limit, count="exact"). Callers do not need to know which one
+they got, so the importer, trainer and stats tools can run fully offline:
+
+    STORAGE_BACKEND=local LOCAL_DB_PATH=snapshot.sqlite python ml/train.py
+
+which retrains from the snapshot, writes the enhanced tables back into it,
+saves the model artifact and prints the result.
+
+The ML service goes through Database, which runs queries asynchronously
+with bounded concurrency (ML_DB_CONCURRENCY) on a pooled client.
+
+Snapshot a live database into a local file with:
+
+    python ml/storage.py snapshot snapshot.sqlite [business_raw businesses ...]
+"""
+
+import asyncio
+import inspect
+import json
+import os
+import sqlite3
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_LOCAL_DB = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "local_store.sqlite"
+)
+
+
+# Queries in flight at once per Database (and Supabase connections in use)
+DB_CONCURRENCY = int(os.getenv("ML_DB_CONCURRENCY", "8"))
+
+_database = None
+_wrapped = {}
+_database_lock = threading.Lock()
+
+
+def get_client(backend=None):
+    """Client for STORAGE_BACKEND ("supabase", the default, or "local")."""
+    backend = _backend(backend)
+    if backend == "local":
+        return LocalClient(os.getenv("LOCAL_DB_PATH", DEFAULT_LOCAL_DB))
+
+    from supabase import create_client
+    return create_client(*_supabase_credentials())
+
+
+def get_database(backend=None):
+    """The process-wide Database for STORAGE_BACKEND, created on first use."""
+    global _database
+    with _database_lock:
+        if _database is None:
+            _database = Database.open(backend)
+        return _database
+
+
+def set_database(database):
+    """Replace the process-wide Database (e.g. with one over a LocalClient)."""
+    global _database
+    with _database_lock:
+        _database = database
+
+
+def as_database(client):
+    """`client` itself if it is a Database, else a Database wrapping it."""
+    if isinstance(client, Database):
+        return client
+    with _database_lock:
+        # Scripts hold one client for their lifetime, so wrappers are kept
+        entry = _wrapped.get(id(client))
+        if entry is None or entry[0] is not client:
+            entry = _wrapped[id(client)] = (client, Database(client))
+        return entry[1]
+
+
+class Database:
+    """
+    Async access to a storage backend with at most `max_concurrency`
+    queries in flight.
+
+    Queries run on one event loop in a background thread. Supabase uses its
+    async client, whose HTTP connection pool is shared by every query;
+    blocking clients (LocalClient) run on a thread pool of the same size.
+    Coroutines await execute(); synchronous code such as the training
+    thread hands whole coroutines to run() or submit(), so independent
+    queries overlap while the caller only waits once.
+    """
+
+    def __init__(self, client, max_concurrency=DB_CONCURRENCY):
+        self.max_concurrency = max_concurrency
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="db-loop", daemon=True
+        )
+        self._thread.start()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._pool = ThreadPoolExecutor(max_concurrency, thread_name_prefix="db")
+        self.client = self.run(client) if inspect.isawaitable(client) else client
+
+    @classmethod
+    def open(cls, backend=None, max_concurrency=DB_CONCURRENCY):
+        backend = _backend(backend)
+        if backend == "local":
+            return cls(get_client(backend), max_concurrency)
+        return cls(_async_supabase(*_supabase_credentials()), max_concurrency)
+
+    def table(self, name):
+        return self.client.table(name)
+
+    async def execute(self, query):
+        """Run a query builder; must be awaited on this Database's loop."""
+        async with self._semaphore:
+            if inspect.iscoroutinefunction(query.execute):
+                return await query.execute()
+            return await self._loop.run_in_executor(self._pool, query.execute)
+
+    def submit(self, coro):
+        """Schedule `coro` on the database loop; returns a concurrent Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def run(self, coro):
+        """Run `coro` on the database loop and wait for its result."""
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("Database.run() called from the database loop; await instead")
+        return self.submit(coro).result()
+
+    def close(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._pool.shutdown()
+
+
+def _backend(backend):
+    backend = (backend or os.getenv("STORAGE_BACKEND", "supabase")).lower()
+    if backend not in ("supabase", "local"):
+        raise RuntimeError(f"Unknown STORAGE_BACKEND: {backend}")
+    return backend
+
+
+def _supabase_credentials():
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+    if not url or not key:
+        raise RuntimeError("SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set in .env")
+    return url, key
+
+
+async def _async_supabase(url, key):
+    from supabase import acreate_client
+    return await acreate_client(url, key)
+
+
+class Response:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class LocalClient:
+    """SQLite-backed stand-in for the Supabase client."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        with self._write_lock:
+            conn = self._conn()
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS _json_columns "
+                "(tbl TEXT, col TEXT, PRIMARY KEY (tbl, col))"
+            )
+            conn.commit()
+
+    def table(self, name):
+        return LocalQuery(self, name)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _columns(self, table):
+        rows = self._conn().execute(f"PRAGMA table_info({_quote(table)})").fetchall()
+        return [row[1] for row in rows]
+
+    def _json_columns(self, table):
+        rows = self._conn().execute(
+            "SELECT col FROM _json_columns WHERE tbl = ?", (table,)
+        ).fetchall()
+        return {row[0] for row in rows}
+
+    def _ensure_table(self, table, rows):
+        conn = self._conn()
+        existing = self._columns(table)
+        wanted = []
+        json_cols = set()
+        for row in rows:
+            for col, value in row.items():
+                if col not in wanted:
+                    wanted.append(col)
+                if isinstance(value, (dict, list)):
+                    json_cols.add(col)
+        if not existing:
+            cols = ", ".join(_quote(c) for c in wanted)
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {_quote(table)} ({cols})")
+        else:
+            for col in wanted:
+                if col not in existing:
+                    conn.execute(f"ALTER TABLE {_quote(table)} ADD COLUMN {_quote(col)}")
+        conn.executemany(
+            "INSERT OR IGNORE INTO _json_columns (tbl, col) VALUES (?, ?)",
+            [(table, col) for col in json_cols],
+        )
+
+
+class LocalQuery:
+    """Chainable query mirroring the postgrest-py builder methods we use."""
+
+    def __init__(self, client, table):
+        self.client = client
+        self.table_name = table
+        self.action = "select"
+        self.columns = "*"
+        self.count = None
+        self.filters = []
+        self.order_by = []
+        self.limit_n = None
+        self.rows = None
+        self.on_conflict = None
+
+    # --- actions -----------------------------------------------------------
+    def select(self, columns="*", count=None):
+        self.action, self.columns, self.count = "select", columns, count
+        return self
+
+    def insert(self, rows):
+        self.action, self.rows = "insert", _as_list(rows)
+        return self
+
+    def upsert(self, rows, on_conflict=None):
+        self.action, self.rows, self.on_conflict = "upsert", _as_list(rows), on_conflict
+        return self
+
+    def delete(self):
+        self.action = "delete"
+        return self
+
+    # --- filters / modifiers -------------------------------------------------
+    def eq(self, col, value):
+        return self._filter(col, "=", value)
+
+    def neq(self, col, value):
+        return self._filter(col, "!=", value)
+
+    def gt(self, col, value):
+        return self._filter(col, ">", value)
+
+    def gte(self, col, value):
+        return self._filter(col, ">=", value)
+
+    def lt(self, col, value):
+        return self._filter(col, "<", value)
+
+    def lte(self, col, value):
+        return self._filter(col, "<=", value)
+
+    def in_(self, col, values):
+        self.filters.append((col, "IN", list(values)))
+        return self
+
+    def order(self, col, desc=False):
+        self.order_by.append((col, desc))
+        return self
+
+    def limit(self, n):
+        self.limit_n = n
+        return self
+
+    def _filter(self, col, op, value):
+        self.filters.append((col, op, value))
+        return self
+
+    # --- execution -----------------------------------------------------------
+    def execute(self):
+        client = self.client
+        if self.action == "select":
+            return self._select()
+        with client._write_lock:
+            conn = client._conn()
+            try:
+                if self.action in ("insert", "upsert"):
+                    result = self._write(conn)
+                else:
+                    result = self._delete(conn)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        return result
+
+    def _where(self, columns):
+        clauses, params = [], []
+        for col, op, value in self.filters:
+            if col not in columns:
+                # Unknown column: PostgREST would error; an empty table has none
+                clauses.append("0")
+                continue
+            if op == "IN":
+                if not value:
+                    clauses.append("0")
+                    continue
+                clauses.append(f"{_quote(col)} IN ({', '.join('?' * len(value))})")
+                params.extend(_encode(v) for v in value)
+            else:
+                clauses.append(f"{_quote(col)} {op} ?")
+                params.append(_encode(value))
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def _select(self):
+        columns = self.client._columns(self.table_name)
+        if not columns:
+            return Response([], 0 if self.count else None)
+
+        if self.columns.strip() == "*":
+            wanted = columns
+        else:
+            wanted = [c.strip() for c in self.columns.split(",") if c.strip()]
+        select_sql = ", ".join(_quote(c) if c in columns else "NULL" for c in wanted)
+
+        where, params = self._where(columns)
+        sql = f"SELECT {select_sql} FROM {_quote(self.table_name)}{where}"
+        if self.order_by:
+            sql += " ORDER BY " + ", ".join(
+                f"{_quote(c)} {'DESC' if desc else 'ASC'}" for c, desc in self.order_by
+            )
+        if self.limit_n is not None:
+            sql += f" LIMIT {int(self.limit_n)}"
+
+        conn = self.client._conn()
+        json_cols = self.client._json_columns(self.table_name)
+        data = [
+            {
+                col: (json.loads(v) if col in json_cols and isinstance(v, str) else v)
+                for col, v in zip(wanted, row)
+            }
+            for row in conn.execute(sql, params)
+        ]
+
+        count = None
+        if self.count:
+            count = conn.execute(
+                f"SELECT COUNT(*) FROM {_quote(self.table_name)}{where}", params
+            ).fetchone()[0]
+        return Response(data, count)
+
+    def _write(self, conn):
+        if not self.rows:
+            return Response([])
+        self.client._ensure_table(self.table_name, self.rows)
+        columns = self.client._columns(self.table_name)
+
+        cols_sql = ", ".join(_quote(c) for c in columns)
+        sql = (
+            f"INSERT INTO {_quote(self.table_name)} ({cols_sql}) "
+            f"VALUES ({', '.join('?' * len(columns))})"
+        )
+        if self.action == "upsert" and self.on_conflict:
+            key = self.on_conflict
+            conn.execute(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS {_quote(self.table_name + '_' + key + '_key')} "
+                f"ON {_quote(self.table_name)} ({_quote(key)})"
+            )
+            # Only overwrite the columns present in the payload, like PostgREST
+            present = [c for c in columns if c != key and any(c in r for r in self.rows)]
+            updates = ", ".join(f"{_quote(c)} = excluded.{_quote(c)}" for c in present)
+            sql += f" ON CONFLICT ({_quote(key)}) DO " + (
+                f"UPDATE SET {updates}" if updates else "NOTHING"
+            )
+
+        conn.executemany(
+            sql, [[_encode(row.get(c)) for c in columns] for row in self.rows]
+        )
+        return Response(self.rows)
+
+    def _delete(self, conn):
+        columns = self.client._columns(self.table_name)
+        if not columns:
+            return Response([])
+        where, params = self._where(columns)
+        conn.execute(f"DELETE FROM {_quote(self.table_name)}{where}", params)
+        return Response([])
+
+
+def snapshot(source, target, tables, key="business_id", chunk_size=1000):
+    """Copy `tables` from one client to another (e.g. Supabase -> local file)."""
+    from source import read_table
+
+    copied = {}
+    for table in tables:
+        df = read_table(source, table, _all_columns(source, table), key=key)
+        rows = df.to_dict(orient="records")
+        for i in range(0, len(rows), chunk_size):
+            target.table(table).upsert(rows[i:i + chunk_size], on_conflict=key).execute()
+        copied[table] = len(rows)
+    return copied
+
+
+def _all_columns(client, table):
+    sample = client.table(table).select("*").limit(1).execute().data
+    return list(sample[0].keys()) if sample else []
+
+
+def _as_list(rows):
+    return rows if isinstance(rows, list) else [rows]
+
+
+def _encode(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    if hasattr(value, "item") and not isinstance(value, (str, bytes)):
+        return value.item()
+    return value
+
+
+def _quote(identifier):
+    return '"' + str(identifier).replace('"', '""') + '"'
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] != "snapshot":
+        print("Usage: python storage.py snapshot <file.sqlite> [table ...]")
+        sys.exit(1)
+
+    from dotenv import load_dotenv
+    load_dotenv(override=True)
+
+    tables = sys.argv[3:] or ["business_raw"]
+    copied = snapshot(get_client("supabase"), LocalClient(sys.argv[2]), tables)
+    for table, count in copied.items():
+        print(f"{table}: {count} rows -> {sys.argv[2]}")
@@ -1,29 +1,59 @@
-from supabase import create_client, Client
 from dotenv import load_dotenv
-import os
+import asyncio
 import pandas as pd
-from sklearn.cluster import KMeans
 from sklearn.preprocessing import OneHotEncoder
-import numpy as np
+from source import RAW_COLUMNS, RAW_DTYPES, read_table
+from features import (
+    COMPACT_FEATURES,
+    build_feature_matrix,
+    compact_dtypes,
+    derive_cluster_features,
+    restore_dtypes,
+    summarize_clusters,
+)
+from elbow import select_k
+from partition import PARTITION, check_partition, fit_partitioned, partition_keys
+from warmstart import WARM_START, align_centers, match_labels
+from density import DENSITY_COLUMNS, derive_radius_densities, encode_zones
+from writer import (
+    fetch_stored_hashes_async,
+    sync_businesses_async,
+    sync_cluster_summaries_async,
+    write_rows,
+    write_rows_async,
+)
+from incremental import ModelState
+from state import get_state, set_state
+from fingerprint import snapshot_fingerprint
+from stats import stats_cache
+from changes import change_log
+from heatmap import build_heatmaps, moved_businesses, update_heatmaps
+from recommend import index_for
+from artifacts import save_artifact
+from storage import get_database
+from profiling import StageProfiler, profile_memory
 
 load_dotenv(override=True)
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
-
 def train_model():
     from datetime import datetime
-    
-    # 1. Fetch ALL businesses from business_raw
-    resp = supabase.table("business_raw").select(
-        "business_id, business_name, general_category, latitude, longitude, street, zone_type, status"
-    ).execute()
 
-    rows = resp.data
+    # Fail on a misconfigured ML_PARTITION before fetching anything
+    check_partition(RAW_COLUMNS, PARTITION)
+
+    # Supabase by default; STORAGE_BACKEND=local trains from a SQLite snapshot.
+    # Queries run async on the shared pool, off the request handlers' threads
+    db = get_database()
+
+    # Per-stage timings, row counts and memory, returned as "profile"
+    profiler = StageProfiler(memory=profile_memory())
 
-    if not rows or len(rows) == 0:
+    # 1. Fetch ALL businesses from business_raw (paginated, concurrent pages)
+    with profiler.stage("fetch") as record:
+        df = read_table(db, "business_raw", RAW_COLUMNS, dtypes=RAW_DTYPES)
+        record["rows"] = len(df)
+
+    if df.empty:
         return {
             "status": "error",
             "trigger": "raw_data_change",
@@ -31,14 +61,40 @@ def train_model():
             "inactive_ignored_in_ml": 0,
             "enhanced_table": "businesses",
             "timestamp": datetime.utcnow().isoformat() + "Z",
-            "message": "No rows found in business_raw"
+            "message": "No rows found in business_raw",
+            "profile": profiler.report()
         }
 
-    df = pd.DataFrame(rows)
-    
     # Normalize status to lowercase for comparison
     df["status"] = df["status"].str.lower()
 
+    # Nothing the model reads changed since the last run (identical re-save,
+    # name or street edit): copy those columns through and skip the retrain
+    with profiler.stage("fingerprint", rows=len(df)):
+        fingerprint = snapshot_fingerprint(df[df["status"].isin(["active", "inactive"])])
+    state = get_state()
+    if state is not None and state.last_result and state.fingerprint == fingerprint:
+        with profiler.stage("passthrough") as record:
+            previous = state.frame
+            changed_rows = state.refresh_passthrough(df)
+            record["rows"] = len(changed_rows)
+            write_stats = write_rows(db, changed_rows, [])
+        if len(changed_rows):
+            # Street edits can move the major roads behind road proximity
+            _refresh_heatmaps(
+                state, profiler,
+                moved_businesses(previous, state.frame, changed_rows["business_id"]),
+            )
+            model_version = save_artifact(state)
+            change_log.record(model_version, updated=changed_rows["business_id"])
+        return _cached_result(state, write_stats, profiler)
+
+    # The stored hashes for the diff in step 8 load while the model trains
+    stored_hashes = db.submit(fetch_stored_hashes_async(db))
+
+    if COMPACT_FEATURES:
+        df = compact_dtypes(df)
+
     # Separate active and inactive businesses
     df_active = df[df["status"] == "active"].copy()
     df_inactive = df[df["status"] == "inactive"].copy()
@@ -47,6 +103,7 @@ def train_model():
     inactive_count = len(df_inactive)
 
     if active_count < 2:
+        stored_hashes.cancel()
         return {
             "status": "error",
             "trigger": "raw_data_change",
@@ -54,75 +111,53 @@ def train_model():
             "inactive_ignored_in_ml": inactive_count,
             "enhanced_table": "businesses",
             "timestamp": datetime.utcnow().isoformat() + "Z",
-            "message": "Not enough active businesses to train model (need at least 2)"
+            "message": "Not enough active businesses to train model (need at least 2)",
+            "profile": profiler.report()
         }
 
     # 2. Prepare features (ONLY for active businesses)
-    encoder = OneHotEncoder(sparse=False)
-    cat_encoded = encoder.fit_transform(df_active[["general_category"]])
+    with profiler.stage("encode", rows=active_count):
+        encoder = OneHotEncoder(sparse=False)
+        encoder.fit(df_active[["general_category"]])
+        features = build_feature_matrix(encoder, df_active)
 
-    features = np.column_stack([
-        df_active["latitude"].astype(float),
-        df_active["longitude"].astype(float),
-        cat_encoded
-    ])
-
-    # 3. Determine optimal k using elbow method
-    inertia_vals = []
-    K_RANGE = range(2, min(10, active_count))
-
-    for k in K_RANGE:
-        kmeans = KMeans(n_clusters=k, random_state=42)
-        kmeans.fit(features)
-        inertia_vals.append(kmeans.inertia_)
-
-    # Best elbow (simple approach)
-    optimal_k = K_RANGE[np.argmin(np.gradient(inertia_vals))]
+    # 3. Determine optimal k using elbow method (candidate fits run in parallel);
+    # partitioned mode runs one elbow search per tile in a process pool.
+    # Warm starts seed every candidate with the previous centroids and keep
+    # the previous cluster ids, so unchanged businesses keep their cluster
+    partitions = None
+    warm_start = None
+    previous_centers = None
+    if WARM_START and PARTITION == "none" and state is not None:
+        previous_centers = align_centers(
+            state.centers, state.encoder.categories_[0], encoder.categories_[0]
+        )
+    with profiler.stage("elbow", rows=active_count):
+        if PARTITION == "none":
+            optimal_k, kmeans, _ = select_k(features, init_centers=previous_centers)
+            if previous_centers is not None:
+                warm_start = {
+                    "previous_k": len(previous_centers),
+                    "kept_ids": match_labels(kmeans, previous_centers),
+                    "iterations": int(kmeans.n_iter_),
+                }
+        else:
+            kmeans, partitions = fit_partitioned(features, partition_keys(df_active))
+            optimal_k = kmeans.n_clusters
 
-    # 4. Train final model
-    kmeans = KMeans(n_clusters=optimal_k, random_state=42)
-    clusters = kmeans.fit_predict(features)
+    # 4. Reuse the already-fitted model for the chosen k
+    clusters = kmeans.labels_
 
     df_active["cluster"] = clusters
 
     # 5. Generate enhanced ML columns for ACTIVE businesses
-    df_active["distance_to_center"] = [
-        float(np.linalg.norm(features[i] - kmeans.cluster_centers_[clusters[i]]))
-        for i in range(len(df_active))
-    ]
-
-    # Business density (cluster population)
-    cluster_counts = df_active["cluster"].value_counts().to_dict()
-    df_active["business_density"] = df_active["cluster"].map(cluster_counts)
-
-    # Competitor density (same category, same cluster)
-    competitor_density = []
-    for i, row in df_active.iterrows():
-        same = df_active[
-            (df_active["cluster"] == row["cluster"]) &
-            (df_active["general_category"] == row["general_category"])
-        ]
-        competitor_density.append(len(same))
-    df_active["competitor_density"] = competitor_density
-
-    # Category distribution (per cluster)
-    category_distribution = {}
-    for cl in sorted(df_active["cluster"].unique()):
-        subset = df_active[df_active["cluster"] == cl]
-        category_distribution[cl] = (
-            subset["general_category"].value_counts(normalize=True).to_dict()
+    with profiler.stage("features", rows=active_count):
+        df_active = derive_cluster_features(
+            df_active, features, clusters, kmeans.cluster_centers_
         )
 
-    df_active["category_distribution"] = df_active["cluster"].map(category_distribution)
-
-    # Add cluster center (lat, lng only)
-    df_active["cluster_center"] = [
-        {
-            "latitude": float(kmeans.cluster_centers_[cluster][0]),
-            "longitude": float(kmeans.cluster_centers_[cluster][1])
-        }
-        for cluster in df_active["cluster"]
-    ]
+        # Spatial densities within 50/100/200 m
+        df_active = derive_radius_densities(df_active)
 
     # 6. Handle INACTIVE businesses (store but mark as inactive, no ML features)
     if inactive_count > 0:
@@ -131,25 +166,166 @@ def train_model():
         df_inactive["distance_to_center"] = None
         df_inactive["business_density"] = None
         df_inactive["competitor_density"] = None
-        df_inactive["category_distribution"] = None
-        df_inactive["cluster_center"] = None
+        for column in DENSITY_COLUMNS:
+            df_inactive[column] = None
 
     # 7. Combine active and inactive
     df_all = pd.concat([df_active, df_inactive], ignore_index=True)
+    if COMPACT_FEATURES:
+        df_all = restore_dtypes(df_all)
+    df_all["zone_encoded"], zones = encode_zones(df_all["zone_type"])
 
-    # 8. Clear existing enhanced table
-    supabase.table("businesses").delete().neq("business_id", "").execute()
+    # 8. Write only new/changed rows and delete rows that disappeared, plus
+    # the center and category mix once per cluster. The writes run on the
+    # database loop while the heatmaps are built; "write" is the wait after
+    summaries = summarize_clusters(df_active, clusters, kmeans.cluster_centers_)
+    changes = {}
+    writes = db.submit(_write_enhanced(db, df_all, summaries, stored_hashes, changes))
 
-    # 9. UPSERT enhanced rows
-    enhanced_rows = df_all.to_dict(orient="records")
-    for row in enhanced_rows:
-        supabase.table("businesses").insert(row).execute()
+    # Keep the fitted model so row-level changes can be applied incrementally,
+    # and persist it so a restarted service can warm-start from disk
+    state = ModelState(encoder, kmeans, df_all, RAW_COLUMNS, zones)
+    state.fingerprint = fingerprint
+    _refresh_heatmaps(state, profiler)
+    with profiler.stage("write", rows=len(df_all)):
+        write_stats = writes.result()
 
-    return {
+    state.last_result = {
         "status": "success",
         "trigger": "raw_data_change",
+        "mode": "full",
+        "optimal_k": int(optimal_k),
+        "partitions": partitions,
+        "warm_start": warm_start,
         "active_processed": active_count,
         "inactive_ignored_in_ml": inactive_count,
         "enhanced_table": "businesses",
+        "fingerprint": fingerprint,
+        "write": write_stats,
+        "profile": profiler.report(),
+        "timestamp": datetime.utcnow().isoformat() + "Z"
+    }
+    # The artifact is written before the state is served, so a failed save
+    # leaves the previous model in place on disk and in memory alike
+    with profiler.stage("artifact"):
+        model_version = save_artifact(state)
+        set_state(state)
+        change_log.record(model_version, **changes)
+        stats_cache.rebuild(state.frame, model_version)
+
+    return dict(state.last_result, model_version=model_version, profile=profiler.report())
+
+async def _write_enhanced(db, df_all, summaries, stored_hashes, changes):
+    stored = await asyncio.wrap_future(stored_hashes)
+    write_stats, clusters = await asyncio.gather(
+        sync_businesses_async(db, df_all, stored=stored, changes=changes),
+        sync_cluster_summaries_async(db, summaries),
+    )
+    write_stats["clusters"] = clusters
+    return write_stats
+
+async def _write_changes(db, changed_rows, removed_ids, summaries):
+    writes = [write_rows_async(db, changed_rows, removed_ids)]
+    if summaries is not None:
+        writes.append(sync_cluster_summaries_async(db, summaries))
+    write_stats, *clusters = await asyncio.gather(*writes)
+    if clusters:
+        write_stats["clusters"] = clusters[0]
+    return write_stats
+
+def _refresh_heatmaps(state, profiler, moved=None):
+    # Per-category opportunity grids served by /heatmaps; after row-level
+    # changes only the cells around the moved businesses are re-scored
+    with profiler.stage("heatmap", rows=len(state.frame)) as record:
+        index = index_for(state.frame)
+        if moved is None or state.heatmaps is None:
+            state.heatmaps = build_heatmaps(index)
+        else:
+            record["moved"] = len(moved[0])
+            state.heatmaps = update_heatmaps(state.heatmaps, index, *moved)
+
+def _cached_result(state, write_stats, profiler):
+    """The last run's result, marked as served from the fingerprint cache."""
+    from datetime import datetime
+
+    return dict(
+        state.last_result,
+        mode="cached",
+        cached_mode=state.last_result.get("mode"),
+        model_version=state.version,
+        write=write_stats,
+        profile=profiler.report(),
+        timestamp=datetime.utcnow().isoformat() + "Z",
+    )
+
+def update_model(events=None):
+    """
+    Apply row-level change events to the in-memory model, recomputing only
+    the affected clusters. Falls back to a full train_model() when there is
+    no fitted model yet or a refit threshold is crossed.
+    """
+    from datetime import datetime
+
+    db = get_database()
+    profiler = StageProfiler(memory=profile_memory())
+    state = get_state()
+    previous = state.frame if state is not None else None
+    with profiler.stage("apply", rows=len(events or [])):
+        update = state.apply_events(events) if state is not None and events else None
+    if update is None:
+        return train_model()
+
+    changed_rows, removed_ids = update
+    with profiler.stage("write", rows=len(changed_rows) + len(removed_ids)):
+        summaries = None
+        if changed_rows["cluster"].notna().any() or removed_ids:
+            summaries = state.cluster_summaries()
+        write_stats = db.run(_write_changes(db, changed_rows, removed_ids, summaries))
+    if not len(changed_rows) and not removed_ids and state.last_result:
+        # Every event was an identical re-save
+        return _cached_result(state, write_stats, profiler)
+
+    with profiler.stage("fingerprint", rows=len(state.frame)):
+        state.fingerprint = snapshot_fingerprint(state.frame)
+
+    active = state.frame[state.frame["status"] == "active"]
+    state.last_result = {
+        "status": "success",
+        "trigger": "raw_data_change",
+        "mode": "incremental",
+        "active_processed": len(active),
+        "inactive_ignored_in_ml": len(state.frame) - len(active),
+        "affected_clusters": sorted(int(c) for c in changed_rows["cluster"].dropna().unique()),
+        "enhanced_table": "businesses",
+        "fingerprint": state.fingerprint,
+        "write": write_stats,
+        "profile": profiler.report(),
         "timestamp": datetime.utcnow().isoformat() + "Z"
     }
+    _refresh_heatmaps(
+        state, profiler,
+        moved_businesses(previous, state.frame, [*changed_rows["business_id"], *removed_ids]),
+    )
+    with profiler.stage("artifact"):
+        model_version = save_artifact(state)
+    inserted = ~changed_rows["business_id"].isin(previous.index)
+    change_log.record(
+        model_version,
+        inserted=changed_rows.loc[inserted, "business_id"],
+        updated=changed_rows.loc[~inserted, "business_id"],
+        deleted=removed_ids,
+    )
+    stats_cache.apply(changed_rows, removed_ids, model_version)
+
+    return dict(state.last_result, model_version=model_version, profile=profiler.report())
+
+
+if __name__ == "__main__":
+    # Offline retrain, e.g. from a snapshot (see storage.py):
+    #   STORAGE_BACKEND=local LOCAL_DB_PATH=snapshot.sqlite python ml/train.py
+    import json
+    import sys
+
+    result = train_model()
+    print(json.dumps(result, indent=2, default=str))
+    sys.exit(0 if result["status"] == "success" else 1)
@@ -0,0 +1,78 @@
+import os
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+# Seed full retrains with the previous run's centroids and keep cluster ids
+WARM_START = os.getenv("ML_WARM_START", "0").lower() in ("1", "true", "yes")
+
+
+def align_centers(centers, old_categories, new_categories):
+    """
+    Previous centers laid out for the current one-hot category columns
+    (see features.build_feature_matrix): new categories get 0, dropped ones
+    are removed.
+    """
+    centers = np.asarray(centers, dtype=float)
+    old_index = {c: i for i, c in enumerate(old_categories)}
+    aligned = np.zeros((len(centers), 2 + len(new_categories)))
+    aligned[:, :2] = centers[:, :2]
+    for j, category in enumerate(new_categories):
+        i = old_index.get(category)
+        if i is not None:
+            aligned[:, 2 + j] = centers[:, 2 + i]
+    return aligned
+
+
+def seed_centers(centers, k, features, random_state=42):
+    """
+    `k` initial centers: the first k previous centers, so ids 0..k-1 start
+    where they were, padded with k-means++ style picks from `features`
+    (weighted by squared distance to the centers so far) when k grew.
+    """
+    seeds = list(np.asarray(centers, dtype=features.dtype)[:k])
+    if len(seeds) == k:
+        return np.vstack(seeds)
+
+    rng = np.random.default_rng(random_state)
+    closest = np.full(len(features), np.inf)
+    for seed in seeds:
+        closest = np.minimum(closest, _sq_distance(features, seed))
+    while len(seeds) < k:
+        total = closest.sum()
+        if seeds and np.isfinite(total) and total > 0:
+            pick = rng.choice(len(features), p=closest / total)
+        else:
+            pick = rng.integers(len(features))
+        seeds.append(features[pick])
+        closest = np.minimum(closest, _sq_distance(features, features[pick]))
+    return np.vstack(seeds)
+
+
+def match_labels(model, previous_centers):
+    """
+    Renumber a fitted KMeans in place so every cluster keeps the id of the
+    previous cluster it is matched to (one-to-one, minimum total center
+    distance). Clusters whose match is not a usable id (k shrank) take the
+    free ids. Returns the number of clusters that kept a previous id.
+    """
+    centers = model.cluster_centers_
+    k = len(centers)
+    previous = np.asarray(previous_centers, dtype=float)[:k]
+    cost = ((centers[:, None, :] - previous[None, :, :]) ** 2).sum(axis=2)
+    rows, cols = linear_sum_assignment(cost)
+
+    ids = np.full(k, -1, dtype=np.int64)
+    ids[rows] = cols
+    free = iter(sorted(set(range(k)) - set(cols.tolist())))
+    for i in np.flatnonzero(ids < 0):
+        ids[i] = next(free)
+
+    model.cluster_centers_ = centers[np.argsort(ids)]
+    model.labels_ = ids[model.labels_]
+    return len(rows)
+
+
+def _sq_distance(features, point):
+    diff = features - point
+    return np.einsum("ij,ij->i", diff, diff)
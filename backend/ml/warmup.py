@@ -0,0 +1,60 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Warmup:
+    """
+    Runs the service's slow start-up steps (heavy imports, loading the model
+    artifact, building indexes, opening the database) once in a background
+    thread, so requests are accepted while they run. Every step is timed; a
+    failing step is recorded and the remaining steps still run.
+    """
+
+    def __init__(self, steps, started=None):
+        self.steps = list(steps)
+        self.started = started if started is not None else time.perf_counter()
+        self.stage = "pending"
+        self.timings = {}
+        self.errors = {}
+        self.ready_seconds = None
+        self._done = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="warmup", daemon=True)
+            self._thread.start()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def report(self):
+        return {
+            "stage": self.stage,
+            "done": self.done,
+            "seconds_since_start": round(time.perf_counter() - self.started, 4),
+            "ready_seconds": self.ready_seconds,
+            "steps": dict(self.timings),
+            "errors": dict(self.errors),
+        }
+
+    def _run(self):
+        for name, step in self.steps:
+            self.stage = name
+            start = time.perf_counter()
+            try:
+                step()
+            except Exception as e:
+                self.errors[name] = f"{type(e).__name__}: {e}"
+                logger.exception("Warm-up step %s failed", name)
+            self.timings[name] = round(time.perf_counter() - start, 4)
+        self.stage = "done"
+        self.ready_seconds = round(time.perf_counter() - self.started, 4)
+        self._done.set()
@@ -0,0 +1,149 @@
+import asyncio
+import hashlib
+import json
+import math
+
+from source import read_table_async
+from storage import as_database
+
+TABLE = "businesses"
+KEY = "business_id"
+HASH_COLUMN = "content_hash"
+
+CLUSTER_TABLE = "cluster_summaries"
+CLUSTER_KEY = "cluster"
+
+CHUNK_SIZE = 500
+
+# Each function takes a client or a storage.Database; the *_async variants
+# take a Database and run on its loop so callers can overlap them.
+
+
+def sync_businesses(client, df_all, chunk_size=CHUNK_SIZE, stored=None, changes=None):
+    db = as_database(client)
+    return db.run(sync_businesses_async(db, df_all, chunk_size, stored, changes))
+
+
+async def sync_businesses_async(db, df_all, chunk_size=CHUNK_SIZE, stored=None, changes=None):
+    """
+    Bring the enhanced `businesses` table in line with df_all.
+
+    Rows are compared with what is already stored by business_id and a
+    content hash: only new/changed rows are upserted (in concurrent chunks)
+    and only rows whose business_id disappeared are deleted. The table is
+    never emptied while the write runs. `stored` may hold the result of an
+    earlier fetch_stored_hashes. A `changes` dict receives the inserted,
+    updated and deleted business_ids.
+    """
+    # Hash off the database loop, overlapping the stored-hash read
+    hashing = asyncio.get_running_loop().run_in_executor(None, _hashed_rows, df_all)
+    if stored is None:
+        stored = await fetch_stored_hashes_async(db)
+    rows = await hashing
+
+    changed = [row for row in rows if stored.get(row[KEY]) != row[HASH_COLUMN]]
+    new_ids = {row[KEY] for row in rows}
+    removed = [business_id for business_id in stored if business_id not in new_ids]
+    if changes is not None:
+        changes["inserted"] = [row[KEY] for row in changed if row[KEY] not in stored]
+        changes["updated"] = [row[KEY] for row in changed if row[KEY] in stored]
+        changes["deleted"] = removed
+
+    stats = await _write(db, changed, removed, chunk_size)
+    stats["unchanged"] = len(rows) - len(changed)
+    return stats
+
+
+def sync_cluster_summaries(client, summaries):
+    db = as_database(client)
+    return db.run(sync_cluster_summaries_async(db, summaries))
+
+
+async def sync_cluster_summaries_async(db, summaries):
+    """
+    Replace the cluster_summaries rows with `summaries` (one row per
+    cluster). Upserts every cluster, then deletes ids no longer produced.
+    """
+    rows = [_clean_row(row) for row in summaries.to_dict(orient="records")]
+    if rows:
+        await db.execute(db.table(CLUSTER_TABLE).upsert(rows, on_conflict=CLUSTER_KEY))
+
+    stored = (await db.execute(db.table(CLUSTER_TABLE).select(CLUSTER_KEY))).data or []
+    current = {row[CLUSTER_KEY] for row in rows}
+    stale = [row[CLUSTER_KEY] for row in stored if row[CLUSTER_KEY] not in current]
+    if stale:
+        await db.execute(db.table(CLUSTER_TABLE).delete().in_(CLUSTER_KEY, stale))
+    return {"upserted": len(rows), "deleted": len(stale)}
+
+
+def write_rows(client, df_rows, removed_ids, chunk_size=CHUNK_SIZE):
+    db = as_database(client)
+    return db.run(write_rows_async(db, df_rows, removed_ids, chunk_size))
+
+
+async def write_rows_async(db, df_rows, removed_ids, chunk_size=CHUNK_SIZE):
+    """Upsert df_rows and delete removed_ids without diffing the whole table."""
+    return await _write(db, _hashed_rows(df_rows), list(removed_ids), chunk_size)
+
+
+async def _write(db, changed, removed, chunk_size):
+    upsert_chunks = _chunks(changed, chunk_size)
+    delete_chunks = _chunks(removed, chunk_size)
+
+    # Chunks run concurrently up to the Database limit; the first failure is raised
+    await asyncio.gather(
+        *(db.execute(db.table(TABLE).upsert(chunk, on_conflict=KEY)) for chunk in upsert_chunks),
+        *(db.execute(db.table(TABLE).delete().in_(KEY, chunk)) for chunk in delete_chunks),
+    )
+
+    return {
+        "upserted": len(changed),
+        "deleted": len(removed),
+        "requests": len(upsert_chunks) + len(delete_chunks),
+    }
+
+
+def content_hash(row):
+    """Stable hash over every column except the hash itself."""
+    payload = {k: v for k, v in row.items() if k != HASH_COLUMN}
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()
+
+
+def fetch_stored_hashes(client):
+    db = as_database(client)
+    return db.run(fetch_stored_hashes_async(db))
+
+
+async def fetch_stored_hashes_async(db):
+    """Map business_id -> content_hash for every row currently stored."""
+    stored = await read_table_async(db, TABLE, [KEY, HASH_COLUMN], key=KEY)
+    return dict(zip(stored[KEY].tolist(), stored[HASH_COLUMN].tolist()))
+
+
+def json_rows(df):
+    """Rows of df as JSON-safe dicts, as they are written to the tables."""
+    return [_clean_row(row) for row in df.to_dict(orient="records")]
+
+
+def _hashed_rows(df):
+    rows = json_rows(df)
+    for row in rows:
+        row[HASH_COLUMN] = content_hash(row)
+    return rows
+
+
+def _chunks(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _clean_row(row):
+    # NaN/numpy scalars are not valid JSON for PostgREST
+    clean = {}
+    for key, value in row.items():
+        if hasattr(value, "item") and not isinstance(value, (dict, list)):
+            value = value.item()
+        if isinstance(value, float) and math.isnan(value):
+            value = None
+        clean[key] = value
+    return clean
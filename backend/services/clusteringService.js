@@ -17,3 +17,23 @@ export async function getBusinessesByCategory(category) {
 
   return data || [];
 }
+
+/**
+ * Per-cluster center, population and category mix written by the ML
+ * service. Business rows only carry `cluster`; join on it client-side.
+ */
+export async function getClusterSummaries(clusterIds) {
+  let query = supabase.from("cluster_summaries").select("*").order("cluster");
+  if (clusterIds?.length) {
+    query = query.in("cluster", clusterIds);
+  }
+
+  const { data, error } = await query;
+
+  if (error) {
+    console.error("Supabase error:", error);
+    throw new Error("Failed to fetch cluster summaries");
+  }
+
+  return data || [];
+}
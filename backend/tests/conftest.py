@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+sys.path.insert(0, os.path.join(BACKEND, "ml"))
+
+# Never reach Supabase from the test suite
+os.environ["STORAGE_BACKEND"] = "local"
+os.environ.setdefault("LOCAL_DB_PATH", os.path.join(tempfile.gettempdir(), "ml_test_store.sqlite"))
+os.environ.setdefault("ML_ARTIFACT_DIR", os.path.join(tempfile.gettempdir(), "ml_test_artifacts"))
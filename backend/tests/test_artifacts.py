@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans
+from sklearn.preprocessing import OneHotEncoder
+
+import artifacts
+from features import build_feature_matrix, derive_cluster_features
+from incremental import ModelState
+
+
+def null_category_state():
+    df = pd.DataFrame({
+        "business_id": range(1, 7),
+        "business_name": [f"Store {i}" for i in range(6)],
+        "general_category": ["Retail", None, "Retail", "Services", None, "Services"],
+        "latitude": [14.50, 14.50, 14.51, 14.60, 14.60, 14.61],
+        "longitude": [121.00, 121.00, 121.01, 121.10, 121.10, 121.11],
+        "street": "Main",
+        "zone_type": "Commercial",
+        "status": "active",
+    })
+    encoder = OneHotEncoder(sparse=False).fit(df[["general_category"]])
+    features = build_feature_matrix(encoder, df)
+    kmeans = KMeans(n_clusters=2, n_init=1, random_state=0).fit(features)
+    df["cluster"] = kmeans.labels_
+    df = derive_cluster_features(df, features, kmeans.labels_, kmeans.cluster_centers_)
+    return ModelState(encoder, kmeans, df, list(df.columns[:8]), ["Commercial"])
+
+
+def test_artifact_with_null_category(tmp_path):
+    state = null_category_state()
+    assert None in list(state.encoder.categories_[0])
+
+    version = artifacts.save_artifact(state, directory=str(tmp_path))
+    loaded = artifacts.load_latest(directory=str(tmp_path))
+    predictor = artifacts.predictor_for(loaded)
+
+    assert loaded.version == version
+    assert int(np.sum(predictor.cluster_counts)) == 6
+    assert int(np.sum(predictor.category_counts)) == 4
+
+    result = predictor.predict([14.5, 14.5, 14.6], [121.0, 121.0, 121.1], ["Retail", None, "Unknown"])
+    assert result["competitor_density"].tolist() == [2, 0, 0]
+    assert result["business_density"].tolist() == [3, 3, 3]
@@ -0,0 +1,55 @@
+import pytest
+
+from changes import ChangeLog
+
+
+def test_changes_merge_across_versions(tmp_path):
+    log = ChangeLog(str(tmp_path / "changelog.jsonl"))
+    log.record(1, inserted=[1, 2, 3])
+    log.record(2, updated=[1], deleted=[2])
+    log.record(3, inserted=[2, 4], deleted=[3])
+    log.record(4, updated=[4], deleted=[5])
+
+    upserted, deleted = log.since(1, 4)
+    # 2 was deleted then inserted again, 4 first appeared in the range
+    assert upserted == {1: "updated", 2: "inserted", 4: "inserted"}
+    assert deleted == [3, 5]
+
+    assert log.since(2, 3) == ({2: "inserted", 4: "inserted"}, [3])
+    assert log.since(4, 4) == ({}, [])
+
+
+def test_changes_reload_from_disk(tmp_path):
+    path = str(tmp_path / "changelog.jsonl")
+    ChangeLog(path).record(1, inserted=[7])
+    ChangeLog(path).record(2, deleted=[7])
+
+    assert ChangeLog(path).since(0, 2) == ({}, [7])
+
+
+def test_pruned_range_is_unavailable(tmp_path):
+    log = ChangeLog(str(tmp_path / "changelog.jsonl"), keep=2)
+    for version in range(1, 5):
+        log.record(version, updated=[version])
+
+    assert log.since(1, 4) is None
+    assert log.since(2, 4) == ({3: "updated", 4: "updated"}, [])
+    # The pruned log is rewritten, so a restarted service agrees
+    assert ChangeLog(log.path, keep=2).since(1, 4) is None
+    assert ChangeLog(log.path, keep=2).since(2, 4) == ({3: "updated", 4: "updated"}, [])
+
+
+def test_missing_version_is_unavailable(tmp_path):
+    log = ChangeLog(str(tmp_path / "changelog.jsonl"))
+    log.record(1, inserted=[1])
+    log.record(3, inserted=[3])
+
+    assert log.since(0, 3) is None
+
+
+def test_version_newer_than_current(tmp_path):
+    log = ChangeLog(str(tmp_path / "changelog.jsonl"))
+    log.record(1, inserted=[1])
+
+    with pytest.raises(ValueError):
+        log.since(5, 1)
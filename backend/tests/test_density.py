@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+from benchmark import generate_businesses
+from density import DensityIndex, patch_densities, radius_densities
+
+
+def active_frame(n=600, seed=2):
+    df = generate_businesses(n, seed=seed)
+    df = df[df["status"] == "Active"].set_index("business_id", drop=False)
+    for column, values in radius_densities(df).items():
+        df[column] = values
+    return df
+
+
+def test_patch_matches_recount():
+    previous = active_frame()
+    index = DensityIndex.from_frame(previous)
+    rng = np.random.default_rng(0)
+
+    current = previous.copy()
+    moved = rng.choice(current.index, 5, replace=False)
+    current.loc[moved, "latitude"] += rng.uniform(-0.001, 0.001, len(moved))
+    current.loc[moved[0], "general_category"] = "Services"
+    removed = current.index[:3].difference(moved)
+    current = current.drop(index=removed)
+    added = current.loc[moved[:2]].copy()
+    added["business_id"] = added.index = [10**6, 10**6 + 1]
+    added["longitude"] += 0.0003
+    current = pd.concat([current, added])
+
+    old_rows = previous.loc[list(moved) + list(removed)]
+    new_rows = current.loc[list(moved) + list(added.index)]
+    patched = index.patched(old_rows.index, new_rows)
+    for column, values in patch_densities(current, index, patched, old_rows, new_rows).items():
+        current.loc[values.index, column] = values
+
+    expected = radius_densities(current)
+    for column, values in expected.items():
+        np.testing.assert_array_equal(current[column].astype(int).to_numpy(), values, column)
+
+
+def test_null_category_has_no_competitors():
+    df = active_frame()
+    df.loc[df.index[:20], "general_category"] = None
+
+    densities = radius_densities(df)
+
+    for label in ("50m", "100m", "200m"):
+        assert not densities[f"competitor_density_{label}"][:20].any()
+    previous = df.copy()
+    for column, values in densities.items():
+        previous[column] = values
+    index = DensityIndex.from_frame(previous)
+
+    current = previous.copy()
+    current.loc[current.index[20:25], "general_category"] = None
+    current.loc[current.index[:5], "general_category"] = "Services"
+    current.loc[current.index[:25:2], "latitude"] += 0.0004
+    old_rows = previous.iloc[:25]
+    new_rows = current.iloc[:25]
+    patched = index.patched(old_rows.index, new_rows)
+    for column, values in patch_densities(current, index, patched, old_rows, new_rows).items():
+        current.loc[values.index, column] = values
+
+    for column, values in radius_densities(current).items():
+        np.testing.assert_array_equal(current[column].astype(int).to_numpy(), values, column)
+
+
+def test_rebuild_keeps_members():
+    previous = active_frame()
+    index = DensityIndex.from_frame(previous)
+    gone = previous.index[:40]
+    rebuilt = index.patched(gone, previous.iloc[:0]).rebuilt()
+
+    assert rebuilt.patch_size == 0
+    assert sorted(rebuilt.ids) == sorted(previous.index.difference(gone))
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+from sklearn.preprocessing import OneHotEncoder
+
+from features import build_feature_matrix, derive_cluster_features, summarize_clusters
+
+
+def frame(categories):
+    return pd.DataFrame({
+        "latitude": np.linspace(14.5, 14.6, len(categories)),
+        "longitude": np.linspace(121.0, 121.1, len(categories)),
+        "general_category": categories,
+    })
+
+
+def test_null_category_has_no_competitors():
+    df = frame([None, "Retail", "Retail", None, "Services", "Retail"])
+    clusters = np.array([0, 0, 0, 1, 1, 1])
+    centers = np.array([[14.5, 121.0], [14.6, 121.1]])
+    features = df[["latitude", "longitude"]].to_numpy()
+
+    result = derive_cluster_features(df.copy(), features, clusters, centers)
+
+    assert result["business_density"].tolist() == [3, 3, 3, 3, 3, 3]
+    assert result["competitor_density"].tolist() == [0, 2, 2, 0, 1, 1]
+
+
+def test_compact_matrix_matches_with_null_category():
+    df = frame(["Retail", None, "Services", "Unknown"])
+    encoder = OneHotEncoder(sparse=False, handle_unknown="ignore").fit(df[["general_category"]][:3])
+
+    compact = build_feature_matrix(encoder, df, np.float32)
+
+    assert np.allclose(compact, build_feature_matrix(encoder, df, np.float64))
+    assert compact[:, 2:].tolist() == [[1, 0, 0], [0, 0, 1], [0, 1, 0], [0, 0, 0]]
+
+
+def test_summaries_skip_null_category():
+    df = frame([None, "Retail", "Retail", None, "Services", "Retail"])
+    clusters = np.array([0, 0, 0, 1, 1, 1])
+    centers = np.array([[14.5, 121.0], [14.6, 121.1]])
+
+    summaries = summarize_clusters(df, clusters, centers).set_index("cluster")
+
+    assert summaries.loc[0, "population"] == 3
+    assert summaries.loc[0, "competitor_counts"] == {"Retail": 2}
+    assert summaries.loc[1, "competitor_counts"] == {"Retail": 1, "Services": 1}
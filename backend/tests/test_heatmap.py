@@ -0,0 +1,56 @@
+import numpy as np
+
+from benchmark import generate_businesses
+from heatmap import build_heatmaps, moved_businesses, update_heatmaps
+from recommend import LocationIndex
+
+
+def location_index(n=800, seed=0):
+    df = generate_businesses(n, seed=seed)
+    df["status"] = df["status"].str.lower()
+    return LocationIndex(df)
+
+
+def exact_layer(index, heatmaps, category):
+    grid_lat, grid_lng = np.meshgrid(heatmaps.latitudes, heatmaps.longitudes, indexing="ij")
+    scores = index.score(grid_lat.ravel(), grid_lng.ravel(), category)
+    exact = np.where(scores["valid"], scores["total"], np.nan)
+    return exact.reshape(grid_lat.shape).astype(np.float32)
+
+
+def test_layers_match_exact_scores():
+    index = location_index()
+    heatmaps = build_heatmaps(index)
+
+    for category in heatmaps.categories:
+        np.testing.assert_array_equal(heatmaps.layer(category), exact_layer(index, heatmaps, category))
+
+
+def test_best_matches_exact_best():
+    index = location_index()
+    heatmaps = build_heatmaps(index)
+
+    for category in heatmaps.categories:
+        best = heatmaps.best(category, top_n=1)[0]
+        assert best["total"] == np.nanmax(exact_layer(index, heatmaps, category))
+
+
+def test_update_matches_rebuild():
+    df = generate_businesses(800, seed=1)
+    df["status"] = df["status"].str.lower()
+    previous = df.set_index("business_id", drop=False)
+    heatmaps = build_heatmaps(LocationIndex(previous))
+
+    current = previous.copy()
+    moved_id, removed_id = current.index[current["status"] == "active"][:2]
+    current.loc[moved_id, "latitude"] += 0.0008
+    current = current.drop(index=removed_id)
+    index = LocationIndex(current)
+
+    updated = update_heatmaps(
+        heatmaps, index, *moved_businesses(previous, current, [moved_id, removed_id])
+    )
+
+    rebuilt = build_heatmaps(index)
+    for category in rebuilt.categories:
+        np.testing.assert_array_equal(updated.layer(category), rebuilt.layer(category))
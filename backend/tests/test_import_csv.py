@@ -0,0 +1,82 @@
+import csv
+
+import import_csv_to_supabase as importer
+
+FIELDS = [
+    "business_id", "business_name", "general_category", "latitude",
+    "longitude", "street", "zone_type", "status",
+]
+
+
+def write_csv(path, duplicate_rows):
+    """13 rows; rows in `duplicate_rows` repeat the previous row's business."""
+    rows = []
+    for row_number in range(13):
+        if row_number in duplicate_rows:
+            row = dict(rows[-1], business_id=str(100 + row_number))
+        else:
+            row = {
+                "business_id": str(100 + row_number),
+                "business_name": f"Store {row_number}",
+                "general_category": "Retail",
+                "latitude": str(14.5 + row_number * 0.01),
+                "longitude": "121.0",
+                "street": "Main",
+                "zone_type": "Commercial",
+                "status": "Active",
+            }
+        rows.append(row)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def batches(csv_file, skip=0):
+    index = importer.DuplicateIndex()
+    rows = importer.skip_rows(importer.clean_rows(csv_file, index), skip)
+    return list(importer.batch_rows(rows, importer.BatchSizer(size=3)))
+
+
+def test_batches_cover_dropped_rows(tmp_path):
+    csv_file = str(tmp_path / "businesses.csv")
+    # Row 3 opens the second batch, row 12 is the last row
+    write_csv(csv_file, duplicate_rows={3, 12})
+    checkpoint = importer.Checkpoint(str(tmp_path / "checkpoint.json"), csv_file)
+
+    result = batches(csv_file)
+    for first, end, _ in result:
+        checkpoint.complete(first, end)
+
+    assert [(first, end) for first, end, _ in result] == [(0, 3), (3, 7), (7, 10), (10, 13)]
+    assert checkpoint.rows_done == 13
+    assert sum(len(batch) for _, _, batch in result) == 11
+
+
+def test_resume_after_duplicate_at_batch_boundary(tmp_path):
+    csv_file = str(tmp_path / "businesses.csv")
+    checkpoint_file = str(tmp_path / "checkpoint.json")
+    write_csv(csv_file, duplicate_rows={3})
+
+    # First run imports two batches, the second starting at the duplicate
+    first_run = batches(csv_file)[:2]
+    checkpoint = importer.Checkpoint(checkpoint_file, csv_file)
+    for first, end, _ in first_run:
+        checkpoint.complete(first, end)
+
+    resumed = importer.Checkpoint(checkpoint_file, csv_file)
+    assert resumed.rows_done == 7
+
+    second_run = batches(csv_file, skip=resumed.rows_done)
+    imported = [b["business_id"] for _, _, batch in first_run + second_run for b in batch]
+    assert second_run[0][0] == 7
+    assert sorted(imported) == sorted(importer.csv_business_ids(csv_file))
+    assert 103 not in imported
+
+
+def test_normalization_tables():
+    assert importer.normalize_category("General Merchandising") == "Merchandise / Trading"
+    assert importer.normalize_category(" food and beverage ") == "Food & Beverages"
+    assert importer.normalize_category("Custom Label ") == "Custom Label"
+    assert importer.ZONE_MAP("COMMERCIAL") == "Commercial"
+    assert importer.STATUS_MAP("Closed") == "inactive"
@@ -0,0 +1,93 @@
+import queue
+import threading
+import time
+
+from jobs import TrainingQueue
+
+
+def recording_queue(debounce_seconds, max_wait_seconds, run=None):
+    calls, finished = [], queue.Queue()
+
+    def record(changes):
+        calls.append((time.monotonic(), changes))
+        return run(changes) if run else {"status": "success"}
+
+    training = TrainingQueue(
+        record, debounce_seconds=debounce_seconds, max_wait_seconds=max_wait_seconds,
+        on_finish=finished.put,
+    )
+    return training, calls, finished
+
+
+def test_burst_is_debounced_into_one_run():
+    training, calls, finished = recording_queue(0.2, 5)
+
+    jobs = {training.submit(changes=[i])["job_id"] for i in range(5)}
+    job = finished.get(timeout=5)
+
+    assert jobs == {job["job_id"]}
+    assert job["status"] == "succeeded" and job["events"] == 5
+    assert [changes for _, changes in calls] == [[0, 1, 2, 3, 4]]
+    assert finished.empty()
+
+
+def test_full_retrain_overrides_events():
+    training, calls, finished = recording_queue(0.1, 5)
+
+    training.submit(changes=[1])
+    training.submit()
+    training.submit(changes=[2])
+    finished.get(timeout=5)
+
+    assert [changes for _, changes in calls] == [None]
+
+
+def test_max_wait_bounds_a_continuous_stream():
+    training, calls, finished = recording_queue(0.3, 0.6)
+
+    start = time.monotonic()
+    for i in range(15):
+        training.submit(changes=[i])
+        time.sleep(0.1)
+    while training.depth():
+        finished.get(timeout=5)
+
+    # Every gap is shorter than the debounce, so only max_wait starts a run
+    # while the stream lasts
+    first_started = calls[0][0] - start
+    assert 0.55 <= first_started < 1.2
+    assert len(calls) >= 2
+    assert sorted(i for _, changes in calls for i in changes) == list(range(15))
+
+
+def test_events_during_a_run_wait_for_the_next_job():
+    release = threading.Event()
+    training, calls, finished = recording_queue(
+        0.05, 5, run=lambda changes: release.wait(5) and {"status": "success"}
+    )
+
+    first = training.submit(changes=[1])
+    while not calls:
+        time.sleep(0.01)
+    second = training.submit(changes=[2])
+    assert second["job_id"] != first["job_id"]
+    assert training.depth() == 2
+
+    release.set()
+    assert finished.get(timeout=5)["job_id"] == first["job_id"]
+    assert finished.get(timeout=5)["job_id"] == second["job_id"]
+    assert [changes for _, changes in calls] == [[1], [2]]
+    assert training.get(second["job_id"])["status"] == "succeeded"
+
+
+def test_failed_run_is_reported():
+    def fail(changes):
+        raise RuntimeError("boom")
+
+    training, _, finished = recording_queue(0.05, 5, run=fail)
+    training.submit()
+    job = finished.get(timeout=5)
+
+    assert job["status"] == "failed"
+    assert job["error"] == "RuntimeError: boom"
+    assert training.latest()["job_id"] == job["job_id"]
@@ -0,0 +1,16 @@
+from benchmark import generate_businesses
+from recommend import MAX_CANDIDATES, MIN_GRID_STEP_M, LocationIndex, grid_size, recommend
+
+
+def test_min_grid_step_fits_candidate_cap():
+    assert grid_size(MIN_GRID_STEP_M) <= MAX_CANDIDATES < grid_size(MIN_GRID_STEP_M - 1)
+
+
+def test_recommend_at_min_grid_step():
+    df = generate_businesses(300, seed=0)
+    df["status"] = df["status"].str.lower()
+    category = df["general_category"].iloc[0]
+
+    result = recommend(LocationIndex(df), category, grid_step_m=MIN_GRID_STEP_M)
+
+    assert result["candidates_scored"] == grid_size(MIN_GRID_STEP_M)
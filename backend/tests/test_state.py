@@ -0,0 +1,59 @@
+from types import SimpleNamespace
+
+import pandas as pd
+
+import artifacts
+import main
+import state
+from stats import StatsCache
+
+
+def model(version):
+    frame = pd.DataFrame({
+        "business_id": [version],
+        "cluster": [0],
+        "general_category": ["Retail"],
+        "zone_type": ["Commercial"],
+        "status": ["active"],
+    })
+    return SimpleNamespace(version=version, frame=frame)
+
+
+def test_loaded_artifact_does_not_replace_a_trained_model(monkeypatch):
+    monkeypatch.setattr(state, "_state", None)
+    monkeypatch.setattr(main, "stats_cache", StatsCache())
+    trained = model(2)
+
+    def load_latest():
+        # A training job publishes while the older artifact is still loading
+        state.set_state(trained)
+        main.stats_cache.rebuild(trained.frame, trained.version)
+        return model(1)
+
+    monkeypatch.setattr(artifacts, "load_latest", load_latest)
+    main._load_model()
+
+    assert state.get_state() is trained
+    assert main.stats_cache.snapshot()[0]["model_version"] == 2
+
+
+def test_loaded_artifact_is_served_without_a_model(monkeypatch):
+    monkeypatch.setattr(state, "_state", None)
+    monkeypatch.setattr(main, "stats_cache", StatsCache())
+    loaded = model(1)
+    monkeypatch.setattr(artifacts, "load_latest", lambda: loaded)
+
+    main._load_model()
+
+    assert state.get_state() is loaded
+    assert main.stats_cache.snapshot()[0]["total"] == 1
+
+
+def test_stats_ignore_older_rebuild():
+    cache = StatsCache()
+    cache.rebuild(model(2).frame, 2)
+    cache.rebuild(model(1).frame, 1)
+
+    payload, _ = cache.snapshot()
+    assert payload["model_version"] == 2
+    assert payload["total"] == 1
@@ -0,0 +1,39 @@
+import pytest
+
+import features
+import partition
+import state
+import storage
+import train
+from benchmark import generate_businesses, seed_store
+from storage import Database, LocalClient
+
+
+def seeded_database(path, n=400):
+    client = LocalClient(str(path))
+    seed_store(client, generate_businesses(n, seed=0))
+    return Database(client)
+
+
+def test_partitioned_training_in_compact_mode(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "_database", seeded_database(tmp_path / "store.sqlite"))
+    monkeypatch.setattr(state, "_state", None)
+    monkeypatch.setattr(features, "COMPACT_FEATURES", True)
+    monkeypatch.setattr(train, "COMPACT_FEATURES", True)
+    monkeypatch.setattr(partition, "PARTITION", "zone_type")
+    monkeypatch.setattr(train, "PARTITION", "zone_type")
+
+    result = train.train_model()
+
+    assert result["status"] == "success"
+    frame = state.get_state().frame
+    zones = set(frame.loc[frame["status"] == "active", "zone_type"].astype(str))
+    assert set(result["partitions"]) == zones
+    assert result["optimal_k"] == sum(result["partitions"].values())
+
+
+def test_unknown_partition_column(monkeypatch):
+    monkeypatch.setattr(train, "PARTITION", "barangay")
+
+    with pytest.raises(ValueError, match="ML_PARTITION='barangay'"):
+        train.train_model()